@@ -1,5 +1,6 @@
-from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi import FastAPI, HTTPException, Request, Response, Query
 import requests
+import httpx
 from bs4 import BeautifulSoup
 import logging
 import re
@@ -9,18 +10,18 @@ from nltk.corpus import stopwords
 from nltk.tokenize import word_tokenize
 from nltk.stem import WordNetLemmatizer
 from sklearn.feature_extraction.text import TfidfVectorizer, CountVectorizer
-import nlpaug.augmenter.word as naw
 import pickle
 import nltk
 import traceback
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import numpy as np
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 import subprocess
 import matplotlib.pyplot as plt
 import ssl
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Literal, Optional
 import torch
 from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, pipeline, AutoModelForQuestionAnswering, AutoModelForCausalLM
 from sentence_transformers import SentenceTransformer
@@ -29,6 +30,24 @@ import json
 from googletrans import Translator
 from google.cloud import translate_v2 as translate
 from translation_server import translate_messages as perform_translation
+from kb_matcher import KnowledgeBaseMatcher
+from qa_cache import TTLCache, answer_cache_key
+from qa_batcher import QABatcher, run_pipeline_batch
+from qa_engine import QAEngine
+from semantic_cache import SemanticCache
+from chat_history_store import ChatHistoryStore
+from chat_history_writer import ChatHistoryWriter
+from chat_history_archive import ChatHistoryArchive, ChatHistoryRetention
+from text_augmentation import augment_chunk_async, check_num_variants
+from text_cleaning import clean_texts_async
+from text_dedup import ExactDedupStream, dedup_options, deduplicate_async
+from text_preprocessing import preprocess_texts_async, steps_applied, options_key as preprocessing_options_key
+from worker_pool import shutdown_process_pool
+from vector_encoding import (ARROW_MEDIA_TYPE, NPY_MEDIA_TYPE, as_little_endian, check_dtype,
+                             negotiate_format, to_arrow, to_base64, to_npy)
+from ndjson_stream import NdjsonReader, is_ndjson, ndjson_response
+from dataset_store import DatasetStore, DatasetNotFound
+from webhook_gateway import WebhookGateway, CircuitBreaker, CircuitOpenError, UpstreamStatusError
 from datetime import datetime
 from sklearn.naive_bayes import MultinomialNB
 from sklearn.linear_model import LogisticRegression
@@ -36,9 +55,11 @@ from sklearn.svm import LinearSVC
 import joblib
 from pathlib import Path
 import asyncio
+import threading
+import time
 import pandas as pd
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI
 from sklearn.metrics.pairwise import cosine_similarity
 from scipy.sparse import csr_matrix
 from fastapi import FastAPI, HTTPException
@@ -62,7 +83,43 @@ SCRIPT_TIMEOUT = 600  # 10 phút
 MODELS_DIR = BASE_DIR / "models"
 FINE_TUNED_MODEL_DIR = BASE_DIR / "phobert-finetuned-viquad2"
 KNOWLEDGE_BASE_PATH = BASE_DIR / "knowledge_base.csv"
+KB_MATCH_THRESHOLD = float(os.getenv("KB_MATCH_THRESHOLD", "0.9"))
+QA_CACHE_MAX_SIZE = int(os.getenv("QA_CACHE_MAX_SIZE", "2048"))
+QA_CACHE_TTL = float(os.getenv("QA_CACHE_TTL", "3600"))
+QA_BATCH_MAX_SIZE = int(os.getenv("QA_BATCH_MAX_SIZE", "16"))
+QA_BATCH_MAX_WAIT_MS = float(os.getenv("QA_BATCH_MAX_WAIT_MS", "5"))
+N8N_WEBHOOK_URL = os.getenv("N8N_WEBHOOK_URL", "https://nlppro.app.n8n.cloud/webhook/chatbot-response")
+WEBHOOK_TIMEOUT = float(os.getenv("WEBHOOK_TIMEOUT", "30"))
+# Tổng thời gian chờ tối đa của một tin nhắn, gồm cả các lần thử lại
+WEBHOOK_DEADLINE = float(os.getenv("WEBHOOK_DEADLINE", str(WEBHOOK_TIMEOUT)))
+WEBHOOK_MAX_CONCURRENCY = int(os.getenv("WEBHOOK_MAX_CONCURRENCY", "20"))
+WEBHOOK_RETRIES = int(os.getenv("WEBHOOK_RETRIES", "2"))
+SENTENCE_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "600"))
+SEMANTIC_CACHE_MAX_SIZE = int(os.getenv("SEMANTIC_CACHE_MAX_SIZE", "1000"))
+QAMode = Literal["category", "multi_passage"]
+QA_MODE = os.getenv("QA_MODE", "category")  # "category" hoặc "multi_passage"
+QA_TOP_PASSAGES = int(os.getenv("QA_TOP_PASSAGES", "5"))
+QA_BACKEND = os.getenv("QA_BACKEND", "torch")  # "torch" hoặc "onnx" (xem export_onnx.py)
+QA_ONNX_MODEL = os.getenv("QA_ONNX_MODEL")  # mặc định: FINE_TUNED_MODEL_DIR/onnx/model.onnx
 SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+CHAT_HISTORY_JSON = os.path.join(SERVER_DIR, "chat_history.json")
+DATASETS_DIR = os.getenv("DATASETS_DIR", os.path.join(SERVER_DIR, "datasets"))
+DATASET_PREVIEW_ROWS = int(os.getenv("DATASET_PREVIEW_ROWS", "20"))
+CHAT_HISTORY_DB = os.getenv("CHAT_HISTORY_DB", os.path.join(SERVER_DIR, "chat_history.db"))
+CHAT_HISTORY_QUEUE_SIZE = int(os.getenv("CHAT_HISTORY_QUEUE_SIZE", "10000"))
+CHAT_HISTORY_BATCH_SIZE = int(os.getenv("CHAT_HISTORY_BATCH_SIZE", "200"))
+CHAT_HISTORY_FLUSH_MS = float(os.getenv("CHAT_HISTORY_FLUSH_MS", "500"))
+CHAT_HISTORY_ARCHIVE_DIR = os.getenv("CHAT_HISTORY_ARCHIVE_DIR", os.path.join(SERVER_DIR, "chat_history_archive"))
+# Giới hạn lưu trữ (0: tắt, mặc định). Tin nhắn đã archive không còn xuất hiện trong search,
+# phân trang và số tin nhắn của session; chỉ đọc được qua /api/chat/history/archive
+CHAT_HISTORY_HOT_DAYS = int(os.getenv("CHAT_HISTORY_HOT_DAYS", "0"))
+CHAT_HISTORY_MAX_SESSION_MESSAGES = int(os.getenv("CHAT_HISTORY_MAX_SESSION_MESSAGES", "0"))
+CHAT_HISTORY_MAX_MESSAGES = int(os.getenv("CHAT_HISTORY_MAX_MESSAGES", "0"))  # 0: không giới hạn
+CHAT_HISTORY_ARCHIVE_DAYS = int(os.getenv("CHAT_HISTORY_ARCHIVE_DAYS", "0"))  # 0: giữ archive mãi mãi
+CHAT_HISTORY_ROTATE_INTERVAL = float(os.getenv("CHAT_HISTORY_ROTATE_INTERVAL", "3600"))
 MODEL_COMPARISON_IMAGE = os.path.join(MODELS_DIR, "model_comparison.png")
 DATA_DIR = Path(__file__).parent.parent / "app" / "[locale]" / "RecSys" / "context-aware"
 MOVIES_FILE = DATA_DIR / "movies.json"
@@ -124,6 +181,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Metadata of binary /represent responses travels in headers
+    expose_headers=["X-Vector-Shape", "X-Vector-Dtype", "X-Model-Name", "X-Features"],
 )
 
 @app.middleware("http")
@@ -190,6 +249,115 @@ def create_model_comparison_image(image_path: str) -> bool:
         logger.error(f"Error creating model comparison image: {str(e)}")
         return False
 
+# Dataset lưu phía server (Parquet) theo id: mỗi bước nhận dataset_id, trả về dataset_id mới + preview
+dataset_store = DatasetStore(DATASETS_DIR)
+
+async def load_dataset(dataset_id: str) -> pd.DataFrame:
+    try:
+        return await asyncio.to_thread(dataset_store.load, dataset_id)
+    except DatasetNotFound:
+        raise HTTPException(status_code=404, detail=f"Dataset {dataset_id} not found")
+
+async def save_dataset(data, parent_id: Optional[str] = None, step: Optional[str] = None,
+                       params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Store a step's output and return its id with a preview for the browser"""
+    try:
+        meta = await asyncio.to_thread(dataset_store.create, data, parent_id, step, params)
+    except ValueError as e:
+        # Cột không lưu được sang Parquet (ví dụ giá trị lồng nhau không cùng kiểu)
+        logger.error(f"Error saving dataset: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"Cannot store dataset: {str(e)}")
+    return await asyncio.to_thread(dataset_store.preview, meta["dataset_id"], DATASET_PREVIEW_ROWS)
+
+def without_vectors(saved: Dict[str, Any]) -> Dict[str, Any]:
+    # Vectors stay on the server; the preview would otherwise carry them all
+    saved["preview"] = [{k: v for k, v in row.items() if k != "vector"} for row in saved["preview"]]
+    return saved
+
+def dataset_texts(df: pd.DataFrame) -> List[str]:
+    if "text" not in df.columns:
+        raise HTTPException(status_code=400, detail="Dataset has no text column")
+    return df["text"].fillna("").astype(str).tolist()
+
+@app.post("/datasets")
+async def create_dataset(request: Request):
+    """Upload records ({"data": [...]}) once and get a dataset id back"""
+    data = (await request.json()).get("data")
+    if not data:
+        raise HTTPException(status_code=400, detail="Data is required")
+    records = [item if isinstance(item, dict) else {"text": item} for item in data]
+    return await save_dataset(records, step="upload")
+
+@app.get("/datasets/{dataset_id}")
+async def get_dataset(dataset_id: str):
+    try:
+        return await asyncio.to_thread(dataset_store.preview, dataset_id, DATASET_PREVIEW_ROWS)
+    except DatasetNotFound:
+        raise HTTPException(status_code=404, detail=f"Dataset {dataset_id} not found")
+
+@app.get("/datasets/{dataset_id}/rows")
+async def get_dataset_rows(dataset_id: str, offset: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=5000)):
+    try:
+        return {"dataset_id": dataset_id, "offset": offset,
+                "rows": await asyncio.to_thread(dataset_store.rows, dataset_id, offset, limit)}
+    except DatasetNotFound:
+        raise HTTPException(status_code=404, detail=f"Dataset {dataset_id} not found")
+
+@app.get("/datasets/{dataset_id}/lineage")
+async def get_dataset_lineage(dataset_id: str):
+    """The dataset and the versions it was derived from, newest first"""
+    try:
+        return {"lineage": await asyncio.to_thread(dataset_store.lineage, dataset_id)}
+    except DatasetNotFound:
+        raise HTTPException(status_code=404, detail=f"Dataset {dataset_id} not found")
+
+@app.delete("/datasets/{dataset_id}")
+async def delete_dataset(dataset_id: str):
+    try:
+        await asyncio.to_thread(dataset_store.delete, dataset_id)
+        return {"success": True}
+    except DatasetNotFound:
+        raise HTTPException(status_code=404, detail=f"Dataset {dataset_id} not found")
+
+def scrape_texts(url: str) -> List[str]:
+    """Paragraph texts of a web page (longer than three words)"""
+    # Add headers to mimic a browser request
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    }
+
+    try:
+        response = requests.get(url, headers=headers, timeout=10, verify=False)
+        response.raise_for_status()
+        
+        # Try different parsers if one fails
+        for parser in ['html.parser', 'lxml', 'html5lib']:
+            try:
+                soup = BeautifulSoup(response.text, parser)
+                # Get text from p tags
+                p_texts = [p.get_text(strip=True) for p in soup.find_all("p") if p.get_text(strip=True)]
+                
+                # If no p tags found, try getting text from divs
+                if not p_texts:
+                    p_texts = [div.get_text(strip=True) for div in soup.find_all("div") if div.get_text(strip=True)]
+                
+                # Filter out very short texts
+                texts = [text for text in p_texts if len(text.split()) > 3]
+                
+                if texts:
+                    logger.info(f"Successfully scraped {len(texts)} text segments from {url}")
+                    return texts
+            except Exception as parser_error:
+                logger.warning(f"Parser {parser} failed: {str(parser_error)}")
+                continue
+        
+        raise HTTPException(status_code=404, detail="No meaningful text found on the page")
+        
+    except requests.Timeout:
+        raise HTTPException(status_code=408, detail="Request timed out")
+    except requests.RequestException as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch URL: {str(e)}")
+
 @app.post("/scrape-url")
 async def scrape_url(request: Request):
     try:
@@ -198,228 +366,279 @@ async def scrape_url(request: Request):
         if not url:
             raise HTTPException(status_code=400, detail="URL is required")
 
-        # Add headers to mimic a browser request
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-
-        try:
-            response = requests.get(url, headers=headers, timeout=10, verify=False)
-            response.raise_for_status()
-            
-            # Try different parsers if one fails
-            for parser in ['html.parser', 'lxml', 'html5lib']:
-                try:
-                    soup = BeautifulSoup(response.text, parser)
-                    # Get text from p tags
-                    p_texts = [p.get_text(strip=True) for p in soup.find_all("p") if p.get_text(strip=True)]
-                    
-                    # If no p tags found, try getting text from divs
-                    if not p_texts:
-                        p_texts = [div.get_text(strip=True) for div in soup.find_all("div") if div.get_text(strip=True)]
-                    
-                    # Filter out very short texts
-                    texts = [text for text in p_texts if len(text.split()) > 3]
-                    
-                    if texts:
-                        logger.info(f"Successfully scraped {len(texts)} text segments from {url}")
-                        return {"data": texts}
-                except Exception as parser_error:
-                    logger.warning(f"Parser {parser} failed: {str(parser_error)}")
-                    continue
-            
-            raise HTTPException(status_code=404, detail="No meaningful text found on the page")
-            
-        except requests.Timeout:
-            raise HTTPException(status_code=408, detail="Request timed out")
-        except requests.RequestException as e:
-            raise HTTPException(status_code=500, detail=f"Failed to fetch URL: {str(e)}")
+        texts = await asyncio.to_thread(scrape_texts, url)
+        if data.get("store"):
+            return await save_dataset([{"text": text} for text in texts], step="scrape", params={"url": url})
+        return {"data": texts}
             
     except Exception as e:
         logger.error(f"Scraping failed for URL: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Scraping failed: {str(e)}")
 
+def num_variants_or_400(options: Dict[str, Any]) -> int:
+    try:
+        # Số biến thể cho mỗi văn bản, sinh trong cùng một lần gọi augmenter
+        return check_num_variants(options.get("num_variants", 1))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.post("/augment-data")
-async def augment_data(request: dict):
-    data = request.get("data")
+async def augment_data(request: Request):
+    if is_ndjson(request):
+        reader = NdjsonReader(request)
+        num_variants = num_variants_or_400(await reader.read_header())
+
+        async def results():
+            async for items in reader.chunks():
+                for augmented in await augment_chunk_async(items, num_variants):
+                    yield augmented
+        return ndjson_response(results())
+
+    body = await request.json()
+    num_variants = num_variants_or_400(body)
+    if body.get("dataset_id"):
+        df = await augment_stage(await load_dataset(body["dataset_id"]), body)
+        return await save_dataset(df, body["dataset_id"], "augment", {"num_variants": num_variants})
+
+    data = body.get("data")
     if not data:
         raise HTTPException(status_code=400, detail="Data is required")
     
-    aug = naw.SynonymAug(aug_p=0.3)
-    augmented_data = []
-    
-    for item in data:
-        # Handle different possible structures of item
-        if isinstance(item, dict):
-            # Case 1: item is a dict like {"text": "text1", "label": "label1"}
-            text = item.get("text")
-            label = item.get("label", "")
-        elif isinstance(item, list) and len(item) > 0:
-            # Case 2: item is a list like ["text1"]
-            text = item[0] if isinstance(item[0], str) else None
-            label = ""
-        elif isinstance(item, str):
-            # Case 3: item is a string like "text1"
-            text = item
-            label = ""
-        else:
-            # Skip invalid items
-            continue
-        
-        # Ensure text is a string and not empty
-        if not isinstance(text, str) or not text.strip():
-            continue
-        
-        try:
-            augmented_text = aug.augment(text)[0]
-            augmented_data.append({"text": augmented_text, "label": label})
-        except Exception as e:
-            print(f"Error augmenting text: {text}, Error: {str(e)}")
-            continue
+    # Augmenter dùng chung, tra cứu từ đồng nghĩa được cache; dữ liệu lớn chạy trên process pool
+    augmented_data = await augment_chunk_async(data, num_variants)
     
     return {"augmented_data": augmented_data}
 
     
+@app.on_event("shutdown")
+async def stop_process_pool():
+    shutdown_process_pool()
+
+def dedup_options_or_400(options: Dict[str, Any]) -> tuple:
+    try:
+        # options["dedup"]: false (mặc định), "exact" hoặc "near"; options["dedup_threshold"]: Jaccard, mặc định 0.8
+        return dedup_options(options)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def dedup_report(mode: str, threshold: float, rows_in: int, merged: List[Dict[str, Any]],
+                 rows_removed: Optional[int] = None) -> Dict[str, Any]:
+    rows_removed = len(merged) if rows_removed is None else rows_removed
+    return {
+        "mode": mode,
+        "threshold": threshold if mode == "near" else None,
+        "rows_in": rows_in,
+        "rows_removed": rows_removed,
+        # {"index", "duplicate_of", "match"}: chỉ số theo thứ tự đầu vào, duplicate_of là dòng được giữ lại
+        "merged": merged,
+        # Với NDJSON, "merged" chỉ liệt kê tối đa STREAM_MAX_MERGED_REPORT dòng
+        "merged_truncated": rows_removed > len(merged)
+    }
+
 @app.post("/clean-data")
 async def clean_data(request: Request):
+    if is_ndjson(request):
+        # Mỗi dòng là một bản ghi {"text": ...}; dòng đầu có thể là {"options": {...}}
+        reader = NdjsonReader(request)
+        options = (await reader.read_header()).get("options", {})
+        mode, threshold = dedup_options_or_400(options)
+        if mode == "near":
+            raise HTTPException(status_code=400, detail="Near-duplicate removal needs the whole dataset; "
+                                                        "send JSON or a dataset_id, or use dedup \"exact\"")
+        # Trùng lặp chính xác được loại ngay khi đọc; bộ nhớ O(số dòng khác nhau), có giới hạn
+        dedup = ExactDedupStream() if mode else None
+
+        async def results():
+            async for records in reader.chunks():
+                texts = [item["text"] if isinstance(item, dict) else item for item in records]
+                for text in await clean_texts_async(texts, options):
+                    if dedup is None or dedup.add(text):
+                        yield {"text": text}
+
+        def summary():
+            if dedup is None:
+                return {}
+            return {"dedup": dedup_report(mode, threshold, dedup.rows_in, dedup.merged, dedup.rows_removed)}
+        return ndjson_response(results(), summary)
+
     try:
         data = await request.json()
-        texts = [item["text"] for item in data["data"]]
         options = data.get("options", {})
+        if data.get("dataset_id"):
+            df = await clean_stage(await load_dataset(data["dataset_id"]), options)
+            saved = await save_dataset(df, data["dataset_id"], "clean", options)
+            return {**saved, "dedup": df.attrs["dedup"]} if "dedup" in df.attrs else saved
+
+        mode, threshold = dedup_options_or_400(options)
+        texts = [item["text"] for item in data["data"]]
         
-        cleaned_texts = []
-        for text in texts:
-            # Remove punctuation
-            if options.get("remove_punctuation", True):
-                text = re.sub(r'[^\w\s]', '', text)
-            
-            # Remove numbers
-            if options.get("remove_numbers", True):
-                text = re.sub(r'\d+', '', text)
-            
-            # Remove extra spaces
-            if options.get("remove_extra_spaces", True):
-                text = ' '.join(text.split())
-            
-            # Remove symbols
-            if options.get("remove_symbols", True):
-                text = re.sub(r'[^\w\s]', '', text)
-            
-            cleaned_texts.append(text)
-        
-        return {"cleaned_data": cleaned_texts}
+        # Một hàm làm sạch gộp cho mỗi tổ hợp options; dữ liệu lớn chạy trên process pool
+        cleaned_texts = await clean_texts_async(texts, options)
+        if not mode:
+            return {"cleaned_data": cleaned_texts}
+
+        # Loại trùng sau khi làm sạch để các bước sau không xử lý lại cùng một nội dung
+        kept, merged = await deduplicate_async(cleaned_texts, mode, threshold)
+        return {
+            "cleaned_data": [cleaned_texts[i] for i in kept],
+            "dedup": dedup_report(mode, threshold, len(cleaned_texts), merged)
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in clean_data: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def extract_texts(data: list) -> List[Any]:
+    """Texts of records given as {"text": ...} objects or bare strings"""
+    texts = []
+    for item in data:
+        if isinstance(item, dict) and "text" in item:
+            texts.append(item["text"])
+        elif isinstance(item, str):
+            texts.append(item)
+    return texts
+
+def preprocessing_key_or_400(options: Dict[str, Any]) -> tuple:
+    try:
+        # options["tokenizer"]: "nltk" (mặc định), "regex" hoặc "vietnamese"
+        return preprocessing_options_key(options)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.post("/preprocess-data")
-async def preprocess_data(request: dict):
+async def preprocess_data(request: Request):
+    if is_ndjson(request):
+        reader = NdjsonReader(request)
+        options = (await reader.read_header()).get("options", {})
+        key = preprocessing_key_or_400(options)
+
+        async def results():
+            async for records in reader.chunks():
+                texts = [text for text in extract_texts(records) if isinstance(text, str)]
+                for processed in await preprocess_texts_async(texts, options):
+                    yield processed
+        # Nhật ký các bước chỉ gửi một lần, ở dòng cuối
+        return ndjson_response(results(), lambda: {
+            "preprocessing_info": {"steps_applied": steps_applied(key), "tokenizer": key[-1]}
+        })
+
     try:
+        request = await request.json()
         data = request.get("data", [])
         options = request.get("options", {})
-        stop_words = set(stopwords.words("english"))
-        lemmatizer = WordNetLemmatizer()
+        key = preprocessing_key_or_400(options)
+        if request.get("dataset_id"):
+            df = await preprocess_stage(await load_dataset(request["dataset_id"]), options)
+            return await save_dataset(df, request["dataset_id"], "preprocess",
+                                      {**options, "steps_applied": steps_applied(key)})
         
         # Extract text from data objects
-        texts = []
-        for item in data:
-            if isinstance(item, dict) and "text" in item:
-                texts.append(item["text"])
-            elif isinstance(item, str):
-                texts.append(item)
-        
-        preprocessed_texts = []
+        texts = extract_texts(data)
+
+        # Stopwords/lemmatizer được khởi tạo một lần; dữ liệu lớn chạy trên process pool
+        preprocessed_texts = await preprocess_texts_async(
+            [text for text in texts if isinstance(text, str)], options
+        )
         preprocessing_info = {
-            "steps_applied": [],
+            "steps_applied": steps_applied(key),
+            "tokenizer": key[-1],
             "original_texts": texts
         }
-        
-        for text in texts:
-            if not isinstance(text, str):
-                continue
-                
-            original_text = text
-            
-            # Apply preprocessing steps
-            if options.get("lowercase", True):
-                text = text.lower()
-                preprocessing_info["steps_applied"].append("lowercase")
-            
-            # Tokenize
-            tokens = word_tokenize(text)
-            preprocessing_info["steps_applied"].append("tokenize")
-            
-            # Remove stopwords
-            if options.get("remove_stopwords", True):
-                tokens = [t for t in tokens if t not in stop_words]
-                preprocessing_info["steps_applied"].append("remove_stopwords")
-            
-            # Lemmatize
-            if options.get("lemmatize", True):
-                tokens = [lemmatizer.lemmatize(t) for t in tokens]
-                preprocessing_info["steps_applied"].append("lemmatize")
-            
-            # Join tokens back into text
-            processed_text = " ".join(tokens)
-            preprocessed_texts.append({
-                "text": processed_text,
-                "original_text": original_text
-            })
             
         return {
             "processed_data": preprocessed_texts,
             "preprocessing_info": preprocessing_info
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in preprocess_data: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# MiniLM sentence encoder shared by /represent and the domain chat semantic cache
+sentence_model = None
+sentence_model_lock = threading.Lock()
+
+def get_sentence_model() -> SentenceTransformer:
+    """Load the MiniLM sentence encoder once"""
+    global sentence_model
+    with sentence_model_lock:
+        if sentence_model is None:
+            logger.info(f"Loading sentence model {SENTENCE_MODEL_NAME}")
+            sentence_model = SentenceTransformer(SENTENCE_MODEL_NAME)
+        return sentence_model
+
 @app.post("/represent")
 async def represent_text(request: Request):
     try:
         data = await request.json()
         # Ensure data is in the correct format
-        if not isinstance(data, dict) or "data" not in data:
+        if not isinstance(data, dict) or ("data" not in data and "dataset_id" not in data):
             raise HTTPException(status_code=400, detail="Invalid data format")
-            
-        # Extract texts from data array
-        texts = []
-        for item in data["data"]:
-            if isinstance(item, dict) and "text" in item:
-                texts.append(item["text"])
-            elif isinstance(item, str):
-                texts.append(item)
+
+        # "format": "json" (mặc định), "npy", "arrow" hoặc "base64"; cũng có thể chọn qua header Accept
+        try:
+            vector_format = negotiate_format(request.headers.get("accept"), data.get("format"))
+            dtype = check_dtype(data.get("dtype", "float32"))  # "float32" hoặc "float16"
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        df = None
+        if data.get("dataset_id"):
+            df = await load_dataset(data["dataset_id"])
+            texts = dataset_texts(df)
+        else:
+            # Extract texts from data array
+            texts = extract_texts(data["data"])
         
         if not texts:
             raise HTTPException(status_code=400, detail="No texts provided")
 
-        # Initialize the sentence transformer model
-        model_name = "sentence-transformers/all-MiniLM-L6-v2"
-        model = SentenceTransformer(model_name)
-        
         # Generate embeddings
-        embeddings = model.encode(texts)
+        model = await asyncio.to_thread(get_sentence_model)
+        embeddings = await asyncio.to_thread(model.encode, texts)
         
-        # Convert numpy arrays to lists for JSON serialization
-        vectors = embeddings.tolist()
+        embeddings = np.asarray(embeddings, dtype=np.float32)
         
-        # Calculate features (e.g., dimensionality, sparsity)
+        # Calculate features (e.g., dimensionality, sparsity), vectorized over the whole matrix
         features = {
-            "dimensionality": len(vectors[0]),
-            "num_samples": len(vectors),
-            "avg_magnitude": float(np.mean([np.linalg.norm(vec) for vec in vectors])),
-            "sparsity": float(np.mean([np.count_nonzero(vec == 0) / len(vec) for vec in vectors]))
+            "dimensionality": int(embeddings.shape[1]),
+            "num_samples": int(embeddings.shape[0]),
+            "avg_magnitude": float(np.linalg.norm(embeddings, axis=1).mean()),
+            "sparsity": float(np.mean(embeddings == 0))
         }
-        
+
+        if df is not None:
+            df["vector"] = list(embeddings)
+            result = without_vectors(await save_dataset(df, data["dataset_id"], "represent", {"model": SENTENCE_MODEL_NAME}))
+            return {**result, "features": features}
+
+        if vector_format in ("npy", "arrow"):
+            # Nhị phân lấy thẳng từ buffer NumPy, không chuyển từng phần tử sang float Python
+            vectors = as_little_endian(embeddings, dtype)
+            headers = {
+                "X-Vector-Shape": ",".join(map(str, vectors.shape)),
+                "X-Vector-Dtype": dtype,
+                "X-Model-Name": SENTENCE_MODEL_NAME,
+                "X-Features": json.dumps(features)
+            }
+            if vector_format == "npy":
+                return Response(content=to_npy(vectors), media_type=NPY_MEDIA_TYPE, headers=headers)
+            return Response(content=to_arrow(vectors, {"model": SENTENCE_MODEL_NAME}),
+                            media_type=ARROW_MEDIA_TYPE, headers=headers)
+
         return {
-            "vectors": vectors,
+            "vectors": to_base64(as_little_endian(embeddings, dtype)) if vector_format == "base64" else embeddings.tolist(),
             "features": features,
             "model_info": {
-                "name": model_name,
+                "name": SENTENCE_MODEL_NAME,
                 "type": "Sentence Transformer"
             }
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in text representation: {str(e)}")
         logger.error(traceback.format_exc())
@@ -726,236 +945,376 @@ class ChatRequest(BaseModel):
     messages: List[ChatMessage]
     chat_name: str
 
+# One pooled, rate-limited client for the n8n chat webhook
+chat_webhook = WebhookGateway(
+    N8N_WEBHOOK_URL,
+    timeout=WEBHOOK_TIMEOUT,
+    max_concurrency=WEBHOOK_MAX_CONCURRENCY,
+    retries=WEBHOOK_RETRIES,
+    breaker=CircuitBreaker(failure_threshold=5, reset_timeout=30.0),
+    deadline=WEBHOOK_DEADLINE
+)
+
+@app.on_event("shutdown")
+async def close_chat_webhook():
+    await chat_webhook.aclose()
+
+async def chat_webhook_reply(user_message: str, session_id: str) -> Dict[str, str]:
+    """Forward a message to the n8n chat webhook and save both sides to chat history"""
+    # Chuẩn bị tham số cho yêu cầu GET
+    params = {
+        "message": user_message,
+        "sessionId": session_id
+    }
+
+    logger.info(f"[*] Đang gửi yêu cầu tới: {N8N_WEBHOOK_URL}")
+    logger.info(f"[*] Tham số: {params}")
+
+    try:
+        reply = await chat_webhook.get_text(params)
+    except CircuitOpenError as e:
+        error_msg = f"[!] Lỗi: {e}"
+        logger.error(error_msg)
+        raise HTTPException(status_code=503, detail=error_msg)
+    except UpstreamStatusError as e:
+        # In ra lỗi nếu mã trạng thái không phải 200
+        error_msg = f"[!] Lỗi: Yêu cầu thất bại với mã trạng thái {e.status_code}"
+        logger.error(error_msg)
+        logger.error(f"[*] Nội dung phản hồi: {e.text}")
+        raise HTTPException(status_code=e.status_code, detail=error_msg)
+    except httpx.TimeoutException:
+        error_msg = "[!] Lỗi: Yêu cầu bị hết thời gian chờ (timeout)."
+        logger.error(error_msg)
+        raise HTTPException(status_code=408, detail=error_msg)
+    except httpx.HTTPError as e:
+        error_msg = f"[!] Lỗi trong quá trình gửi yêu cầu: {e}"
+        logger.error(error_msg)
+        raise HTTPException(status_code=500, detail=error_msg)
+
+    # Lưu tin nhắn vào lịch sử
+    await save_chat_history(session_id, "user", user_message)
+    await save_chat_history(session_id, "assistant", reply)
+
+    return {"message": reply}
+
+@app.get("/api/chat/webhook-stats")
+async def chat_webhook_stats():
+    """Circuit breaker state of the n8n chat webhook"""
+    return chat_webhook.stats()
+
 @app.post("/api/chat/context")
 async def context_chat_endpoint(request: ChatRequest):
     try:
         # Lấy tin nhắn cuối cùng từ người dùng
         user_message = request.messages[-1].content if request.messages else ""
-        
-        # Chuẩn bị tham số cho yêu cầu GET
-        params = {
-            "message": user_message,
-            "sessionId": request.chat_name
-        }
+        return await chat_webhook_reply(user_message, request.chat_name)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in context chat: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Lịch sử chat: SQLite (WAL), mỗi tin nhắn là một dòng INSERT
+chat_history_store = ChatHistoryStore(CHAT_HISTORY_DB)
+# Ghi theo lô ở nền để request không phải chờ ghi đĩa
+chat_history_writer = ChatHistoryWriter(
+    chat_history_store,
+    max_queue_size=CHAT_HISTORY_QUEUE_SIZE,
+    batch_size=CHAT_HISTORY_BATCH_SIZE,
+    flush_interval=CHAT_HISTORY_FLUSH_MS / 1000.0
+)
 
-        logger.info(f"[*] Đang gửi yêu cầu tới: https://nlppro.app.n8n.cloud/webhook/chatbot-response")
-        logger.info(f"[*] Tham số: {params}")
+@app.on_event("startup")
+async def migrate_chat_history():
+    """Import the old chat_history.json into the SQLite store once"""
+    try:
+        await asyncio.to_thread(chat_history_store.migrate_json, CHAT_HISTORY_JSON)
+    except Exception as e:
+        logger.error(f"Error migrating chat history: {str(e)}")
+
+# Tin nhắn cũ được chuyển sang các file gzip theo ngày, DB chỉ giữ phần "nóng"
+chat_history_archive = ChatHistoryArchive(CHAT_HISTORY_ARCHIVE_DIR)
+chat_history_retention = ChatHistoryRetention(
+    chat_history_store,
+    chat_history_archive,
+    hot_days=CHAT_HISTORY_HOT_DAYS,
+    max_session_messages=CHAT_HISTORY_MAX_SESSION_MESSAGES,
+    max_total_messages=CHAT_HISTORY_MAX_MESSAGES,
+    archive_days=CHAT_HISTORY_ARCHIVE_DAYS
+)
+chat_history_rotation_task = None
 
+async def rotate_chat_history_periodically():
+    while True:
         try:
-            # Thực hiện yêu cầu GET với timeout 30 giây
-            response = requests.get(
-                "https://nlppro.app.n8n.cloud/webhook/chatbot-response",
-                params=params,
-                timeout=30
-            )
+            await chat_history_writer.flush()
+            await asyncio.to_thread(chat_history_retention.rotate)
+        except Exception as e:
+            logger.error(f"Error rotating chat history: {str(e)}")
+        await asyncio.sleep(CHAT_HISTORY_ROTATE_INTERVAL)
 
-            # In ra mã trạng thái HTTP
-            logger.info(f"\n[*] Mã trạng thái HTTP: {response.status_code}")
+@app.on_event("startup")
+async def start_chat_history_rotation():
+    global chat_history_rotation_task
+    chat_history_rotation_task = asyncio.create_task(rotate_chat_history_periodically())
 
-            # Kiểm tra xem yêu cầu có thành công không (mã 200 OK)
-            if response.status_code == 200:
-                # Lưu tin nhắn vào lịch sử
-                await save_chat_history(request.chat_name, "user", user_message)
-                await save_chat_history(request.chat_name, "assistant", response.text)
-                
-                return {"message": response.text}
-            else:
-                # In ra lỗi nếu mã trạng thái không phải 200
-                error_msg = f"[!] Lỗi: Yêu cầu thất bại với mã trạng thái {response.status_code}"
-                logger.error(error_msg)
-                logger.error(f"[*] Nội dung phản hồi: {response.text}")
-                raise HTTPException(status_code=response.status_code, detail=error_msg)
-
-        except requests.exceptions.Timeout:
-            error_msg = "[!] Lỗi: Yêu cầu bị hết thời gian chờ (timeout)."
-            logger.error(error_msg)
-            raise HTTPException(status_code=408, detail=error_msg)
-        except requests.exceptions.RequestException as e:
-            error_msg = f"[!] Lỗi trong quá trình gửi yêu cầu: {e}"
-            logger.error(error_msg)
-            raise HTTPException(status_code=500, detail=error_msg)
-        except Exception as e:
-            error_msg = f"[!] Có lỗi không mong muốn xảy ra: {e}"
-            logger.error(error_msg)
-            raise HTTPException(status_code=500, detail=error_msg)
-            
-    except Exception as e:
-        logger.error(f"Error in context chat: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+@app.on_event("shutdown")
+async def stop_chat_history_rotation():
+    if chat_history_rotation_task is not None:
+        chat_history_rotation_task.cancel()
+
+@app.on_event("shutdown")
+async def flush_chat_history():
+    """Write every queued chat message before the process exits"""
+    await chat_history_writer.stop()
 
 async def save_chat_history(chat_name: str, role: str, content: str):
     try:
-        # Lưu tin nhắn vào file JSON
-        history_file = os.path.join(SERVER_DIR, "chat_history.json")
-        
-        # Đọc lịch sử hiện tại
-        if os.path.exists(history_file):
-            with open(history_file, "r", encoding="utf-8") as f:
-                history = json.load(f)
-        else:
-            history = {}
-            
-        # Thêm tin nhắn mới
-        if chat_name not in history:
-            history[chat_name] = []
-            
-        history[chat_name].append({
-            "role": role,
-            "content": content,
-            "timestamp": datetime.now().isoformat()
-        })
-        
-        # Lưu lại lịch sử
-        with open(history_file, "w", encoding="utf-8") as f:
-            json.dump(history, f, ensure_ascii=False, indent=2)
-            
+        await chat_history_writer.save(chat_name, role, content)
     except Exception as e:
         logger.error(f"Error saving chat history: {str(e)}")
 
-@app.post("/classify")
-async def classify_text(request: Request):
+@app.get("/api/chat/history/sessions")
+async def list_chat_sessions(limit: int = Query(50, ge=1, le=200), before: Optional[int] = None):
+    """Chat sessions, most recently active first; pass next_cursor as before for the next page"""
     try:
-        data = await request.json()
-        texts = []
-        for item in data.get("data", []):
-            if isinstance(item, dict) and "text" in item:
-                texts.append(item["text"])
-            elif isinstance(item, str):
-                texts.append(item)
-            
-        if not texts:
-            raise HTTPException(status_code=400, detail="No texts provided")
+        await chat_history_writer.flush()
+        return await asyncio.to_thread(chat_history_store.list_sessions, limit, before)
+    except Exception as e:
+        logger.error(f"Error listing chat sessions: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/chat/history/messages")
+async def chat_session_messages(chat_name: str, limit: int = Query(50, ge=1, le=200),
+                                before: Optional[int] = None, after: Optional[int] = None):
+    """One page of a session's messages (latest page by default)"""
+    if before is not None and after is not None:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+    try:
+        # Tin nhắn còn trong hàng đợi ghi cũng phải xuất hiện trong trang
+        await chat_history_writer.flush()
+        return await asyncio.to_thread(chat_history_store.page, chat_name, limit, before, after)
+    except Exception as e:
+        logger.error(f"Error reading chat messages: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        task = data.get("task")
-        model_type = data.get("modelType", "svm")
+@app.get("/api/chat/history/search")
+async def search_chat_history(q: str, chat_name: Optional[str] = None, role: Optional[str] = None,
+                              since: Optional[str] = None, until: Optional[str] = None,
+                              limit: int = Query(20, ge=1, le=100), offset: int = Query(0, ge=0)):
+    """Full-text search over chat messages with session, role and time filters"""
+    try:
+        await chat_history_writer.flush()
+        return await asyncio.to_thread(
+            chat_history_store.search, q,
+            chat_name=chat_name, role=role, since=since, until=until, limit=limit, offset=offset
+        )
+    except Exception as e:
+        logger.error(f"Error searching chat history: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Map task names to dataset names and their corresponding label mappings
-        task_map = {
-            "Sentiment Analysis": {
-                "dataset": "IMDB_Reviews",
-                "labels": {
-                    0: "Negative",
-                    1: "Positive"
-                }
-            },
-            "Text Classification": {
-                "dataset": "BBC_News",
-                "labels": {
-                    0: "business",
-                    1: "entertainment",
-                    2: "politics",
-                    3: "sport",
-                    4: "tech"
-                }
-            },
-            "Spam Detection": {
-                "dataset": "SMS_Spam",
-                "labels": {
-                    0: "ham",
-                    1: "spam"
-                }
-            },
-            "Rating Prediction": {
-                "dataset": "Yelp_Reviews",
-                "labels": {
-                    0: "1 star",
-                    1: "2 stars",
-                    2: "3 stars",
-                    3: "4 stars",
-                    4: "5 stars"
-                }
-            }
-        }
+@app.get("/api/chat/history/archive")
+async def archived_chat_messages(chat_name: Optional[str] = None, since: Optional[str] = None,
+                                 until: Optional[str] = None, limit: int = Query(200, ge=1, le=5000),
+                                 after: Optional[int] = None):
+    """Messages moved out of the database by the retention policy, oldest first; pass next_cursor as after"""
+    try:
+        return await asyncio.to_thread(chat_history_archive.read, chat_name, since, until, limit, after)
+    except Exception as e:
+        logger.error(f"Error reading chat history archive: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Map model type to model file name
-        model_map = {
-            "naive_bayes": "Naive_Bayes",
-            "logistic_regression": "Logistic_Regression",
-            "svm": "SVM"
+@app.get("/api/chat/history/stats")
+async def chat_history_stats():
+    """Write-behind queue counters and archive size of the chat history"""
+    return {**chat_history_writer.stats(), "archive": await asyncio.to_thread(chat_history_archive.stats)}
+
+# Map task names to dataset names and their corresponding label mappings
+CLASSIFY_TASK_MAP = {
+    "Sentiment Analysis": {
+        "dataset": "IMDB_Reviews",
+        "labels": {
+            0: "Negative",
+            1: "Positive"
+        }
+    },
+    "Text Classification": {
+        "dataset": "BBC_News",
+        "labels": {
+            0: "business",
+            1: "entertainment",
+            2: "politics",
+            3: "sport",
+            4: "tech"
+        }
+    },
+    "Spam Detection": {
+        "dataset": "SMS_Spam",
+        "labels": {
+            0: "ham",
+            1: "spam"
         }
+    },
+    "Rating Prediction": {
+        "dataset": "Yelp_Reviews",
+        "labels": {
+            0: "1 star",
+            1: "2 stars",
+            2: "3 stars",
+            3: "4 stars",
+            4: "5 stars"
+        }
+    }
+}
 
-        task_info = task_map.get(task)
-        if not task_info:
-            raise HTTPException(status_code=400, detail=f"Task {task} not supported")
+# Map model type to model file name
+CLASSIFY_MODEL_MAP = {
+    "naive_bayes": "Naive_Bayes",
+    "logistic_regression": "Logistic_Regression",
+    "svm": "SVM"
+}
 
-        dataset_name = task_info["dataset"]
-        label_mapping = task_info["labels"]
+def load_classifier(task: str, model_type: str) -> Dict[str, Any]:
+    """Trained model, vectorizer and label mapping for a /classify task"""
+    task_info = CLASSIFY_TASK_MAP.get(task)
+    if not task_info:
+        raise HTTPException(status_code=400, detail=f"Task {task} not supported")
 
-        model_name = model_map.get(model_type)
-        if not model_name:
-            raise HTTPException(status_code=400, detail=f"Model type {model_type} not supported")
+    dataset_name = task_info["dataset"]
+    model_name = CLASSIFY_MODEL_MAP.get(model_type)
+    if not model_name:
+        raise HTTPException(status_code=400, detail=f"Model type {model_type} not supported")
 
-        # Load the trained model and vectorizer
-        try:
-            model_path = os.path.join(MODELS_DIR, f"{dataset_name}_{model_name}.pkl")
-            vectorizer_path = os.path.join(MODELS_DIR, f"{dataset_name}_vectorizer.pkl")
+    # Load the trained model and vectorizer
+    try:
+        model_path = os.path.join(MODELS_DIR, f"{dataset_name}_{model_name}.pkl")
+        vectorizer_path = os.path.join(MODELS_DIR, f"{dataset_name}_vectorizer.pkl")
+        
+        if not os.path.exists(model_path) or not os.path.exists(vectorizer_path):
+            raise FileNotFoundError(f"Model or vectorizer not found for {dataset_name}")
+        
+        # Use joblib for loading
+        model = joblib.load(model_path)
+        vectorizer = joblib.load(vectorizer_path)
             
-            if not os.path.exists(model_path) or not os.path.exists(vectorizer_path):
-                raise FileNotFoundError(f"Model or vectorizer not found for {dataset_name}")
+        logger.info(f"Loaded model and vectorizer for {dataset_name}")
+    except Exception as e:
+        logger.error(f"Error loading model/vectorizer: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error loading model")
+
+    return {
+        "model": model,
+        "vectorizer": vectorizer,
+        "labels": task_info["labels"],
+        "model_info": {
+            "dataset": dataset_name,
+            "model": model_name,
+            "task": task
+        }
+    }
+
+def classify_chunk(texts: List[str], classifier: Dict[str, Any]) -> Dict[str, list]:
+    """Predictions for one batch of texts"""
+    model, vectorizer, label_mapping = classifier["model"], classifier["vectorizer"], classifier["labels"]
+
+    # Basic preprocessing
+    processed_texts = []
+    for text in texts:
+        # Convert to lowercase
+        text = text.lower()
+        # Remove extra whitespace
+        text = ' '.join(text.split())
+        processed_texts.append(text)
+
+    # Transform texts using vectorizer
+    X = vectorizer.transform(processed_texts)
+    
+    # Get predictions and probabilities if available
+    predictions = model.predict(X)
+    
+    # Try to get prediction probabilities if the model supports it
+    try:
+        if hasattr(model, 'predict_proba'):
+            probabilities = model.predict_proba(X)
+        else:
+            # For models like SVM that don't have predict_proba
+            probabilities = None
+    except:
+        probabilities = None
+
+    # Map predictions to labels
+    mapped_predictions = []
+    confidence_scores = []
+    
+    for idx, pred in enumerate(predictions):
+        # Get the mapped label
+        mapped_label = label_mapping.get(pred, str(pred))
+        mapped_predictions.append(mapped_label)
+        
+        # Get confidence score if available
+        if probabilities is not None:
+            confidence = float(probabilities[idx][pred])
+            confidence_scores.append(confidence)
+        else:
+            confidence_scores.append(None)
+
+    return {
+        "predictions": mapped_predictions,
+        "raw_predictions": predictions.tolist(),
+        "confidence_scores": confidence_scores,
+        "processed_texts": processed_texts
+    }
+
+@app.post("/classify")
+async def classify_text(request: Request):
+    if is_ndjson(request):
+        # Dòng đầu: {"options": {...}, "task": ..., "modelType": ...}
+        reader = NdjsonReader(request)
+        header = await reader.read_header()
+        classifier = await asyncio.to_thread(
+            load_classifier, header.get("task"), header.get("modelType", "svm")
+        )
+
+        async def results():
+            async for records in reader.chunks():
+                texts = extract_texts(records)
+                result = await asyncio.to_thread(classify_chunk, texts, classifier)
+                for i, text in enumerate(texts):
+                    yield {
+                        "text": text,
+                        "prediction": result["predictions"][i],
+                        "raw_prediction": result["raw_predictions"][i],
+                        "confidence_score": result["confidence_scores"][i],
+                        "processed_text": result["processed_texts"][i]
+                    }
+        return ndjson_response(results(), lambda: {"model_info": classifier["model_info"]})
+
+    try:
+        data = await request.json()
+        if data.get("dataset_id"):
+            df = await classify_stage(await load_dataset(data["dataset_id"]), data)
+            model_info = df.attrs["model_info"]
+            saved = await save_dataset(df, data["dataset_id"], "classify", model_info)
+            return {**saved, "model_info": model_info}
+
+        texts = extract_texts(data.get("data", []))
             
-            # Use joblib for loading
-            model = joblib.load(model_path)
-            vectorizer = joblib.load(vectorizer_path)
-                
-            logger.info(f"Loaded model and vectorizer for {dataset_name}")
-        except Exception as e:
-            logger.error(f"Error loading model/vectorizer: {str(e)}")
-            raise HTTPException(status_code=500, detail="Error loading model")
+        if not texts:
+            raise HTTPException(status_code=400, detail="No texts provided")
+
+        classifier = await asyncio.to_thread(load_classifier, data.get("task"), data.get("modelType", "svm"))
 
         # Preprocess and transform texts
         try:
-            # Basic preprocessing
-            processed_texts = []
-            for text in texts:
-                # Convert to lowercase
-                text = text.lower()
-                # Remove extra whitespace
-                text = ' '.join(text.split())
-                processed_texts.append(text)
-
-            # Transform texts using vectorizer
-            X = vectorizer.transform(processed_texts)
-            
-            # Get predictions and probabilities if available
-            predictions = model.predict(X)
-            
-            # Try to get prediction probabilities if the model supports it
-            try:
-                if hasattr(model, 'predict_proba'):
-                    probabilities = model.predict_proba(X)
-                else:
-                    # For models like SVM that don't have predict_proba
-                    probabilities = None
-            except:
-                probabilities = None
-
-            # Map predictions to labels
-            mapped_predictions = []
-            confidence_scores = []
-            
-            for idx, pred in enumerate(predictions):
-                # Get the mapped label
-                mapped_label = label_mapping.get(pred, str(pred))
-                mapped_predictions.append(mapped_label)
-                
-                # Get confidence score if available
-                if probabilities is not None:
-                    confidence = float(probabilities[idx][pred])
-                    confidence_scores.append(confidence)
-                else:
-                    confidence_scores.append(None)
+            result = await asyncio.to_thread(classify_chunk, texts, classifier)
 
             response_data = {
-                "predictions": mapped_predictions,
-                "raw_predictions": predictions.tolist(),
-                "confidence_scores": confidence_scores,
+                "predictions": result["predictions"],
+                "raw_predictions": result["raw_predictions"],
+                "confidence_scores": result["confidence_scores"],
                 "input_texts": texts,
-                "processed_texts": processed_texts,
-                "model_info": {
-                    "dataset": dataset_name,
-                    "model": model_name,
-                    "task": task
-                }
+                "processed_texts": result["processed_texts"],
+                "model_info": classifier["model_info"]
             }
 
             return response_data
@@ -965,42 +1324,248 @@ async def classify_text(request: Request):
             logger.error(traceback.format_exc())
             raise HTTPException(status_code=500, detail=f"Error during prediction: {str(e)}")
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in classify_text: {str(e)}")
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=str(e))
 
+# Các bước xử lý dùng chung cho dataset_id và /pipeline: nhận DataFrame, trả DataFrame
+async def scrape_stage(df: Optional[pd.DataFrame], options: Dict[str, Any]) -> pd.DataFrame:
+    if not options.get("url"):
+        raise HTTPException(status_code=400, detail="URL is required")
+    texts = await asyncio.to_thread(scrape_texts, options["url"])
+    return pd.DataFrame({"text": texts})
+
+async def clean_stage(df: pd.DataFrame, options: Dict[str, Any]) -> pd.DataFrame:
+    mode, threshold = dedup_options_or_400(options)
+    df["text"] = await clean_texts_async(dataset_texts(df), options)
+    if mode:
+        kept, merged = await deduplicate_async(df["text"].tolist(), mode, threshold)
+        rows_in = len(df)
+        df = df.iloc[kept].reset_index(drop=True)
+        df.attrs["dedup"] = dedup_report(mode, threshold, rows_in, merged)
+    return df
+
+async def preprocess_stage(df: pd.DataFrame, options: Dict[str, Any]) -> pd.DataFrame:
+    preprocessing_key_or_400(options)
+    texts = dataset_texts(df)
+    processed = await preprocess_texts_async(texts, options)
+    return df.assign(text=[item["text"] for item in processed], original_text=texts)
+
+async def augment_stage(df: pd.DataFrame, options: Dict[str, Any]) -> pd.DataFrame:
+    augmented_data = await augment_chunk_async(df.to_dict("records"), num_variants_or_400(options))
+    return pd.DataFrame.from_records(augmented_data, columns=["text", "label"])
+
+async def represent_stage(df: pd.DataFrame, options: Dict[str, Any]) -> pd.DataFrame:
+    model = await asyncio.to_thread(get_sentence_model)
+    embeddings = await asyncio.to_thread(model.encode, dataset_texts(df))
+    df["vector"] = list(np.asarray(embeddings, dtype=np.float32))
+    return df
+
+async def classify_stage(df: pd.DataFrame, options: Dict[str, Any]) -> pd.DataFrame:
+    classifier = await asyncio.to_thread(load_classifier, options.get("task"), options.get("modelType", "svm"))
+    result = await asyncio.to_thread(classify_chunk, dataset_texts(df), classifier)
+    df = df.assign(prediction=result["predictions"], confidence_score=result["confidence_scores"],
+                   processed_text=result["processed_texts"])
+    df.attrs["model_info"] = classifier["model_info"]
+    return df
+
+PIPELINE_STAGES = {
+    "scrape": scrape_stage,
+    "clean": clean_stage,
+    "preprocess": preprocess_stage,
+    "augment": augment_stage,
+    "represent": represent_stage,
+    "classify": classify_stage,
+}
+
+class PipelineStage(BaseModel):
+    name: str
+    options: Dict[str, Any] = {}
+
+class PipelineRequest(BaseModel):
+    stages: List[PipelineStage]
+    data: Optional[List[Any]] = None
+    dataset_id: Optional[str] = None
+    store: bool = False  # True: lưu kết quả thành dataset mới, chỉ trả về id + preview
+
+@app.post("/pipeline")
+async def run_pipeline(request: PipelineRequest):
+    """Run several processing stages in one call on one in-memory table"""
+    if not request.stages:
+        raise HTTPException(status_code=400, detail="At least one stage is required")
+    unknown = [stage.name for stage in request.stages if stage.name not in PIPELINE_STAGES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown stages {unknown}, expected: {', '.join(PIPELINE_STAGES)}")
+    if any(stage.name == "scrape" for stage in request.stages[1:]):
+        raise HTTPException(status_code=400, detail="scrape can only be the first stage")
+
+    try:
+        if request.stages[0].name == "scrape":
+            df = None
+        elif request.dataset_id:
+            df = await load_dataset(request.dataset_id)
+        elif request.data:
+            df = pd.DataFrame.from_records([item if isinstance(item, dict) else {"text": item} for item in request.data])
+        else:
+            raise HTTPException(status_code=400, detail="data or dataset_id is required")
+
+        timings = []
+        model_info = None
+        for stage in request.stages:
+            rows_in = 0 if df is None else len(df)
+            start = time.perf_counter()
+            df = await PIPELINE_STAGES[stage.name](df, stage.options)
+            timings.append({
+                "stage": stage.name,
+                "ms": round((time.perf_counter() - start) * 1000, 1),
+                "rows_in": rows_in,
+                "rows_out": len(df)
+            })
+            if "dedup" in df.attrs:
+                timings[-1]["dedup"] = df.attrs.pop("dedup")
+            model_info = df.attrs.get("model_info", model_info)
+
+        total_ms = round(sum(timing["ms"] for timing in timings), 1)
+        if request.store:
+            saved = without_vectors(await save_dataset(df, request.dataset_id, "pipeline",
+                                                       {"stages": [stage.dict() for stage in request.stages]}))
+            return {**saved, "timings": timings, "total_ms": total_ms, "model_info": model_info}
+
+        if "vector" in df.columns:
+            df["vector"] = [vector.tolist() for vector in df["vector"]]
+        # Bản ghi thiếu cột (vd. không có label) thành NaN, JSON không cho phép NaN
+        df = df.astype(object).where(df.notna(), None)
+        return {
+            "data": df.to_dict("records"),
+            "timings": timings,
+            "total_ms": total_ms,
+            "model_info": model_info
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in pipeline: {str(e)}")
+        logger.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Initialize QA pipeline and knowledge base
 qa_pipeline = None
 knowledge_base_df = None
+knowledge_base_mtime = None
+kb_matcher = None
+
+# Answers keyed on normalized question + context hash, shared by both QA endpoints
+qa_answer_cache = TTLCache(max_size=QA_CACHE_MAX_SIZE, ttl=QA_CACHE_TTL)
+
+def load_knowledge_base():
+    """Load the knowledge base and build the direct-answer index"""
+    global knowledge_base_df, knowledge_base_mtime, kb_matcher
+
+    if os.path.exists(KNOWLEDGE_BASE_PATH):
+        knowledge_base_df = pd.read_csv(KNOWLEDGE_BASE_PATH)
+        knowledge_base_mtime = os.path.getmtime(KNOWLEDGE_BASE_PATH)
+        kb_matcher = KnowledgeBaseMatcher(knowledge_base_df, threshold=KB_MATCH_THRESHOLD)
+        # Cached answers were computed from the previous contexts
+        qa_answer_cache.clear()
+        pretokenize_kb_contexts()
+        logger.info("Knowledge base loaded successfully")
+    else:
+        logger.error(f"Knowledge base file not found at {KNOWLEDGE_BASE_PATH}")
+
+def ensure_knowledge_base() -> Optional[pd.DataFrame]:
+    """Return the knowledge base, reloading it when knowledge_base.csv changed on disk"""
+    if os.path.exists(KNOWLEDGE_BASE_PATH):
+        if knowledge_base_df is None or os.path.getmtime(KNOWLEDGE_BASE_PATH) != knowledge_base_mtime:
+            load_knowledge_base()
+    return knowledge_base_df
+
+def pretokenize_kb_contexts():
+    """Tokenize every category context once so QA requests only tokenize the question"""
+    if qa_pipeline is None or knowledge_base_df is None:
+        return
+    contexts = [get_context_from_kb(category, knowledge_base_df)
+                for category in knowledge_base_df['Category'].unique()]
+    # Individual answers are the passages of the multi-passage mode
+    contexts += knowledge_base_df['Answer'].dropna().astype(str).unique().tolist()
+    qa_pipeline.pretokenize_contexts(contexts)
+    logger.info(f"Pre-tokenized {len(contexts)} knowledge base contexts")
 
 def load_qa_model_and_data():
     """Load the QA model and knowledge base data"""
-    global qa_pipeline, knowledge_base_df
+    global qa_pipeline
     
     try:
         # Load QA model
         if os.path.exists(FINE_TUNED_MODEL_DIR):
-            qa_pipeline = pipeline(
-                "question-answering",
-                model=str(FINE_TUNED_MODEL_DIR),
-                tokenizer=str(FINE_TUNED_MODEL_DIR)
+            qa_pipeline = QAEngine(
+                FINE_TUNED_MODEL_DIR,
+                backend=QA_BACKEND,
+                onnx_path=QA_ONNX_MODEL
             )
-            logger.info("QA model loaded successfully")
+            logger.info(f"QA model loaded successfully ({QA_BACKEND} backend)")
         else:
             logger.error(f"QA model directory not found at {FINE_TUNED_MODEL_DIR}")
             
         # Load knowledge base
-        if os.path.exists(KNOWLEDGE_BASE_PATH):
-            knowledge_base_df = pd.read_csv(KNOWLEDGE_BASE_PATH)
-            logger.info("Knowledge base loaded successfully")
-        else:
-            logger.error(f"Knowledge base file not found at {KNOWLEDGE_BASE_PATH}")
+        load_knowledge_base()
             
     except Exception as e:
         logger.error(f"Error loading QA model or knowledge base: {str(e)}")
         raise
 
+def run_qa_batch(questions: List[str], contexts: List[Any], multi_passage: bool = False,
+                 **kwargs) -> List[Dict[str, Any]]:
+    """Answer a batch of (question, context) pairs with the shared QA pipeline
+
+    With multi_passage=True every context is a list of passages and each
+    question gets the best span across its own passages.
+    """
+    if multi_passage:
+        return qa_pipeline.answer_from_passages_batch(questions, contexts, **kwargs)
+    return run_pipeline_batch(qa_pipeline, questions, contexts, **kwargs)
+
+# Concurrent QA requests are micro-batched in front of the shared pipeline
+qa_batcher = QABatcher(
+    run_qa_batch,
+    max_batch_size=QA_BATCH_MAX_SIZE,
+    max_wait_ms=QA_BATCH_MAX_WAIT_MS
+)
+
+@app.on_event("shutdown")
+async def stop_qa_batcher():
+    await qa_batcher.stop()
+
+async def answer_from_top_passages(question: str, max_answer_len: int = 15) -> Optional[Dict[str, Any]]:
+    """Multi-passage mode: best span over the top retrieved KB answers in one forward pass"""
+    passages = kb_matcher.top_passages(question, QA_TOP_PASSAGES) if kb_matcher is not None else []
+    if not passages:
+        return None
+
+    texts = [passage["answer"] for passage in passages]
+    cache_key = answer_cache_key(question, "\n".join(texts), "multi_passage", max_answer_len)
+    result = qa_answer_cache.get(cache_key)
+    cached = result is not None
+    if not cached:
+        # Qua qa_batcher như các câu hỏi khác: không chạy model song song ngoài hàng đợi
+        result = await qa_batcher.submit(question, texts, multi_passage=True, max_answer_len=max_answer_len)
+        result = {
+            "answer": result["answer"],
+            "score": float(result["score"]),
+            "category": passages[result["passage_index"]]["category"]
+        }
+        qa_answer_cache.set(cache_key, result)
+    return {**result, "cached": cached}
+
+def find_direct_answer(question: str) -> Optional[Dict[str, Any]]:
+    """Return the KB row whose question matches closely enough to skip the QA model"""
+    ensure_knowledge_base()
+    if kb_matcher is None:
+        return None
+    return kb_matcher.match(question)
+
 def classify_question(question: str) -> str:
     """Classify a question into FAQ, SP, or EVEN categories"""
     question = question.lower()
@@ -1035,11 +1600,27 @@ def get_context_from_kb(category: str, df: pd.DataFrame) -> str:
 class FineTunedQARequest(BaseModel):
     message: str
     sessionId: str
+    mode: Optional[QAMode] = None  # mặc định QA_MODE
 
 @app.post("/api/fine-tuned-qa")
 async def fine_tuned_qa_endpoint(request: FineTunedQARequest):
     """Endpoint for fine-tuned QA with knowledge base"""
     try:
+        question = request.message
+
+        # Near-verbatim KB questions are answered directly, without the QA model
+        direct_match = find_direct_answer(question)
+        if direct_match:
+            await save_chat_history(request.sessionId, "user", question)
+            await save_chat_history(request.sessionId, "assistant", direct_match["answer"])
+            return {
+                "response": direct_match["answer"],
+                "confidence": direct_match["score"],
+                "category": direct_match["category"],
+                "direct_match": True,
+                "matched_question": direct_match["question"]
+            }
+
         # Check if model and knowledge base are loaded
         if qa_pipeline is None or knowledge_base_df is None:
             load_qa_model_and_data()
@@ -1049,8 +1630,24 @@ async def fine_tuned_qa_endpoint(request: FineTunedQARequest):
                     detail="QA model or knowledge base not available"
                 )
         
-        # Get question and classify it
-        question = request.message
+        # Multi-passage mode: top retrieved KB answers instead of one category context
+        if (request.mode or QA_MODE) == "multi_passage":
+            result = await answer_from_top_passages(question, max_answer_len=100)
+            if result is None:
+                return {
+                    "response": "Xin lỗi, tôi không tìm thấy thông tin phù hợp để trả lời câu hỏi của bạn."
+                }
+            await save_chat_history(request.sessionId, "user", question)
+            await save_chat_history(request.sessionId, "assistant", result['answer'])
+            return {
+                "response": result['answer'],
+                "confidence": result['score'],
+                "category": result['category'],
+                "direct_match": False,
+                "cached": result['cached']
+            }
+        
+        # Classify the question
         category = classify_question(question)
         
         # Get context from knowledge base
@@ -1060,12 +1657,14 @@ async def fine_tuned_qa_endpoint(request: FineTunedQARequest):
                 "response": "Xin lỗi, tôi không tìm thấy thông tin phù hợp để trả lời câu hỏi của bạn."
             }
         
-        # Get answer from QA model
-        result = qa_pipeline(
-            question=question,
-            context=context,
-            max_answer_len=100
-        )
+        # Get answer from the cache or the QA model
+        cache_key = answer_cache_key(question, context, 100)
+        result = qa_answer_cache.get(cache_key)
+        cached = result is not None
+        if not cached:
+            result = await qa_batcher.submit(question, context, max_answer_len=100)
+            result = {"answer": result['answer'], "score": float(result['score'])}
+            qa_answer_cache.set(cache_key, result)
         
         # Save chat history
         await save_chat_history(request.sessionId, "user", question)
@@ -1074,7 +1673,9 @@ async def fine_tuned_qa_endpoint(request: FineTunedQARequest):
         return {
             "response": result['answer'],
             "confidence": result['score'],
-            "category": category
+            "category": category,
+            "direct_match": False,
+            "cached": cached
         }
         
     except Exception as e:
@@ -1085,63 +1686,71 @@ async def fine_tuned_qa_endpoint(request: FineTunedQARequest):
             detail=f"Error processing question: {str(e)}"
         )
 
+@app.get("/api/fine-tuned-qa/cache-stats")
+async def fine_tuned_qa_cache_stats():
+    """Hit/miss counters of the QA answer cache and micro-batcher"""
+    return {**qa_answer_cache.stats(), "batcher": qa_batcher.stats()}
+
 class DomainChatRequest(BaseModel):
     message: str
     sessionId: str
+    useCache: bool = True  # False: luôn hỏi webhook cho phiên này
+
+# Câu trả lời của webhook theo embedding câu hỏi (bật bằng SEMANTIC_CACHE_ENABLED=true)
+domain_semantic_cache = None
+
+def get_domain_semantic_cache() -> SemanticCache:
+    global domain_semantic_cache
+    if domain_semantic_cache is None:
+        domain_semantic_cache = SemanticCache(
+            dim=get_sentence_model().get_sentence_embedding_dimension(),
+            threshold=SEMANTIC_CACHE_THRESHOLD,
+            ttl=SEMANTIC_CACHE_TTL,
+            max_size=SEMANTIC_CACHE_MAX_SIZE
+        )
+    return domain_semantic_cache
 
-@app.post("/api/chat/domain")
-async def domain_chat_endpoint(request: DomainChatRequest):
-    try:
-        # Lấy tin nhắn từ người dùng
-        user_message = request.message
-        
-        # Chuẩn bị tham số cho yêu cầu GET
-        params = {
-            "message": user_message,
-            "sessionId": request.sessionId
-        }
+def embed_message(message: str) -> np.ndarray:
+    return get_sentence_model().encode(message, normalize_embeddings=True)
 
-        logger.info(f"[*] Đang gửi yêu cầu tới: https://nlppro.app.n8n.cloud/webhook/chatbot-response")
-        logger.info(f"[*] Tham số: {params}")
+async def cached_domain_reply(message: str, session_id: str) -> Dict[str, Any]:
+    """Answer from the semantic cache when a similar message was answered recently"""
+    cache = await asyncio.to_thread(get_domain_semantic_cache)
+    embedding = await asyncio.to_thread(embed_message, message)
 
-        try:
-            # Thực hiện yêu cầu GET với timeout 30 giây
-            response = requests.get(
-                "https://nlppro.app.n8n.cloud/webhook/chatbot-response",
-                params=params,
-                timeout=30
-            )
+    hit = cache.lookup(embedding)
+    if hit is not None:
+        logger.info(f"Semantic cache hit ({hit['similarity']:.3f}): {message!r} ~ {hit['question']!r}")
+        await save_chat_history(session_id, "user", message)
+        await save_chat_history(session_id, "assistant", hit["answer"])
+        return {
+            "message": hit["answer"],
+            "cached": True,
+            "similarity": hit["similarity"],
+            "matched_question": hit["question"]
+        }
 
-            # In ra mã trạng thái HTTP
-            logger.info(f"\n[*] Mã trạng thái HTTP: {response.status_code}")
+    start = time.perf_counter()
+    result = await chat_webhook_reply(message, session_id)
+    cache.add(embedding, message, result["message"], time.perf_counter() - start)
+    return {**result, "cached": False}
 
-            # Kiểm tra xem yêu cầu có thành công không (mã 200 OK)
-            if response.status_code == 200:
-                # Lưu tin nhắn vào lịch sử
-                await save_chat_history(request.sessionId, "user", user_message)
-                await save_chat_history(request.sessionId, "assistant", response.text)
-                
-                return {"message": response.text}
-            else:
-                # In ra lỗi nếu mã trạng thái không phải 200
-                error_msg = f"[!] Lỗi: Yêu cầu thất bại với mã trạng thái {response.status_code}"
-                logger.error(error_msg)
-                logger.error(f"[*] Nội dung phản hồi: {response.text}")
-                raise HTTPException(status_code=response.status_code, detail=error_msg)
-
-        except requests.exceptions.Timeout:
-            error_msg = "[!] Lỗi: Yêu cầu bị hết thời gian chờ (timeout)."
-            logger.error(error_msg)
-            raise HTTPException(status_code=408, detail=error_msg)
-        except requests.exceptions.RequestException as e:
-            error_msg = f"[!] Lỗi trong quá trình gửi yêu cầu: {e}"
-            logger.error(error_msg)
-            raise HTTPException(status_code=500, detail=error_msg)
-        except Exception as e:
-            error_msg = f"[!] Có lỗi không mong muốn xảy ra: {e}"
-            logger.error(error_msg)
-            raise HTTPException(status_code=500, detail=error_msg)
-            
+@app.get("/api/chat/domain/cache-stats")
+async def domain_cache_stats():
+    """Hit rate and upstream latency saved by the domain chat semantic cache"""
+    if not SEMANTIC_CACHE_ENABLED:
+        return {"enabled": False}
+    cache = await asyncio.to_thread(get_domain_semantic_cache)
+    return {"enabled": True, **cache.stats()}
+
+@app.post("/api/chat/domain")
+async def domain_chat_endpoint(request: DomainChatRequest):
+    try:
+        if SEMANTIC_CACHE_ENABLED and request.useCache:
+            return await cached_domain_reply(request.message, request.sessionId)
+        return await chat_webhook_reply(request.message, request.sessionId)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in domain chat: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1149,26 +1758,52 @@ async def domain_chat_endpoint(request: DomainChatRequest):
 class FineTunedRequest(BaseModel):
     message: str
     sessionId: str
+    mode: Optional[QAMode] = None  # mặc định QA_MODE
 
 @app.post("/api/chat/fine-tuned")
 async def fine_tuned_chat_endpoint(request: FineTunedRequest):
     try:
-        # Load the fine-tuned model for question answering
-        model = AutoModelForQuestionAnswering.from_pretrained(FINE_TUNED_MODEL_DIR)
-        tokenizer = AutoTokenizer.from_pretrained(FINE_TUNED_MODEL_DIR)
-        
-        # Create QA pipeline
-        qa_pipeline = pipeline(
-            "question-answering",
-            model=model,
-            tokenizer=tokenizer
-        )
-        
+        # Near-verbatim KB questions are answered directly, without loading the model
+        direct_match = find_direct_answer(request.message)
+        if direct_match:
+            await save_chat_history(request.sessionId, "user", request.message)
+            await save_chat_history(request.sessionId, "assistant", direct_match["answer"])
+            return JSONResponse(content={
+                'response': direct_match["answer"],
+                'confidence': direct_match["score"],
+                'category': direct_match["category"],
+                'direct_match': True,
+                'matched_question': direct_match["question"]
+            })
+
+        # Multi-passage mode: top retrieved KB answers instead of one category context
+        if (request.mode or QA_MODE) == "multi_passage":
+            if qa_pipeline is None:
+                load_qa_model_and_data()
+                if qa_pipeline is None:
+                    raise HTTPException(status_code=500, detail="QA model not available")
+            result = await answer_from_top_passages(request.message)
+            if result is None:
+                return JSONResponse(content={
+                    'response': "Xin lỗi, tôi không tìm thấy thông tin phù hợp để trả lời câu hỏi của bạn.",
+                    'confidence': 0.0,
+                    'category': None
+                })
+            await save_chat_history(request.sessionId, "user", request.message)
+            await save_chat_history(request.sessionId, "assistant", result['answer'])
+            return JSONResponse(content={
+                'response': result['answer'],
+                'confidence': result['score'],
+                'category': result['category'],
+                'direct_match': False,
+                'cached': result['cached']
+            })
+
         # Classify question to get appropriate context
         category = classify_question(request.message)
         
         # Get context from knowledge base
-        df = pd.read_csv(KNOWLEDGE_BASE_PATH)
+        df = ensure_knowledge_base()
         context = get_context_from_kb(category, df)
         
         if not context:
@@ -1178,11 +1813,20 @@ async def fine_tuned_chat_endpoint(request: FineTunedRequest):
                 'category': category
             })
         
-        # Get answer using the pipeline
-        result = qa_pipeline({
-            'question': request.message,
-            'context': context
-        })
+        cache_key = answer_cache_key(request.message, context)
+        result = qa_answer_cache.get(cache_key)
+        cached = result is not None
+        if not cached:
+            # Share the fine-tuned model loaded for /api/fine-tuned-qa
+            if qa_pipeline is None:
+                load_qa_model_and_data()
+                if qa_pipeline is None:
+                    raise HTTPException(status_code=500, detail="QA model not available")
+            
+            # Get answer using the batched pipeline
+            result = await qa_batcher.submit(request.message, context)
+            result = {'answer': result['answer'], 'score': float(result['score'])}
+            qa_answer_cache.set(cache_key, result)
         
         # Save chat history
         await save_chat_history(request.sessionId, "user", request.message)
@@ -1191,7 +1835,9 @@ async def fine_tuned_chat_endpoint(request: FineTunedRequest):
         response = {
             'response': result['answer'],
             'confidence': float(result['score']),
-            'category': category
+            'category': category,
+            'direct_match': False,
+            'cached': cached
         }
         
         return JSONResponse(content=response)
@@ -1200,8 +1846,8 @@ async def fine_tuned_chat_endpoint(request: FineTunedRequest):
         logger.error(f"Error in fine-tuned chat: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-# Initialize OpenAI client for aimlapi.com
-aiml_client = OpenAI(
+# Initialize async OpenAI client for aimlapi.com (doesn't block the event loop)
+aiml_async_client = AsyncOpenAI(
     base_url=os.getenv("AIMLAPI_BASE_URL", "https://api.aimlapi.com/v1"),
     api_key=os.getenv("AIMLAPI_KEY", "726fbcd05d824ddab7bb770de05dc1d6")
 )
@@ -1209,6 +1855,12 @@ aiml_client = OpenAI(
 class AimlChatRequest(BaseModel):
     messages: List[ChatMessage]
     chat_name: str
+    stream: bool = False  # True: trả về Server-Sent Events theo từng token
+
+def sse_event(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    """Format one Server-Sent Event"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
 
 @app.post("/api/chat/general")
 async def general_chat_endpoint(request: AimlChatRequest):
@@ -1224,13 +1876,47 @@ async def general_chat_endpoint(request: AimlChatRequest):
             })
 
         # Call aimlapi.com
-        response = aiml_client.chat.completions.create(
+        response = await aiml_async_client.chat.completions.create(
             model=os.getenv("AIMLAPI_MODEL", "gpt-3.5-turbo"),
             messages=formatted_messages,
             temperature=0.7,
-            max_tokens=1000
+            max_tokens=1000,
+            stream=request.stream
         )
 
+        if request.stream:
+            chunks: List[str] = []
+            completed = False
+
+            async def event_stream():
+                nonlocal completed
+                try:
+                    async for chunk in response:
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta.content
+                        if delta:
+                            chunks.append(delta)
+                            yield sse_event({"delta": delta})
+                    completed = True
+                    yield sse_event({"message": "".join(chunks)}, event="done")
+                except Exception as e:
+                    logger.error(f"Error streaming AIML chat: {str(e)}")
+                    yield sse_event({"error": str(e)}, event="error")
+
+            async def save_streamed_response():
+                # Một câu trả lời bị cắt giữa chừng không được lưu vào lịch sử
+                if completed and chunks:
+                    await save_chat_history(request.chat_name, "assistant", "".join(chunks))
+
+            # Chat history is saved once the whole stream has been sent
+            return StreamingResponse(
+                event_stream(),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+                background=BackgroundTask(save_streamed_response)
+            )
+
         # Get the response content
         ai_response = response.choices[0].message.content
 
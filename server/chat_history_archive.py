@@ -0,0 +1,188 @@
+import gzip
+import json
+import logging
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from chat_history_store import ChatHistoryStore
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+_DAY_RE = re.compile(r"^\d{4}-\d{2}-\d{2}")
+
+
+def _segment_day(timestamp: str) -> str:
+    match = _DAY_RE.match(timestamp or "")
+    return match.group(0) if match else "undated"
+
+
+class ChatHistoryArchive:
+    """Archived chat messages as one gzip JSONL segment per day
+
+    manifest.json records, for every segment, its message count, id and time
+    range and the sessions it contains, so reads only open the segments that
+    can hold matching messages. Appending to a segment adds a gzip member,
+    which gzip readers concatenate transparently.
+    """
+
+    def __init__(self, archive_dir: Union[str, Path]):
+        self.archive_dir = Path(archive_dir)
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.archive_dir / MANIFEST_NAME
+        self._lock = threading.Lock()
+
+    def manifest(self) -> Dict[str, Dict[str, Any]]:
+        if not self.manifest_path.exists():
+            return {}
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)["segments"]
+
+    def _save_manifest(self, segments: Dict[str, Dict[str, Any]]):
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"segments": segments}, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+
+    def write(self, rows: List[Dict[str, Any]]):
+        """Append messages (dicts with id, chat_name, role, content, timestamp) to their day segments"""
+        by_day: Dict[str, List[Dict[str, Any]]] = {}
+        for row in rows:
+            by_day.setdefault(_segment_day(row["timestamp"]), []).append(row)
+
+        with self._lock:
+            segments = self.manifest()
+            for day, day_rows in by_day.items():
+                file_name = f"{day}.jsonl.gz"
+                with open(self.archive_dir / file_name, "ab") as raw:
+                    with gzip.GzipFile(fileobj=raw, mode="ab") as f:
+                        f.write("".join(json.dumps(row, ensure_ascii=False) + "\n" for row in day_rows).encode("utf-8"))
+                    raw.flush()
+                    os.fsync(raw.fileno())
+
+                segment = segments.setdefault(day, {
+                    "file": file_name, "count": 0, "min_id": day_rows[0]["id"], "max_id": day_rows[0]["id"],
+                    "start": day_rows[0]["timestamp"], "end": day_rows[0]["timestamp"], "sessions": [],
+                })
+                segment["count"] += len(day_rows)
+                segment["min_id"] = min(segment["min_id"], min(row["id"] for row in day_rows))
+                segment["max_id"] = max(segment["max_id"], max(row["id"] for row in day_rows))
+                segment["start"] = min(segment["start"], min(row["timestamp"] for row in day_rows))
+                segment["end"] = max(segment["end"], max(row["timestamp"] for row in day_rows))
+                segment["sessions"] = sorted(set(segment["sessions"]) | {row["chat_name"] for row in day_rows})
+            self._save_manifest(segments)
+
+    def _segment_rows(self, segment: Dict[str, Any], chat_name: Optional[str], since: Optional[str],
+                      until: Optional[str], after: Optional[int]) -> List[Dict[str, Any]]:
+        """Matching messages of one segment, by id (a segment holds one day, so this stays small)"""
+        rows = {}
+        with gzip.open(self.archive_dir / segment["file"], "rt", encoding="utf-8") as f:
+            for line in f:
+                row = json.loads(line)
+                if after is not None and row["id"] <= after:
+                    continue
+                if chat_name is not None and row["chat_name"] != chat_name:
+                    continue
+                if (since is not None and row["timestamp"] < since) or (until is not None and row["timestamp"] >= until):
+                    continue
+                # A crash between archiving and deleting can archive a message twice
+                rows[row["id"]] = row
+        return [rows[row_id] for row_id in sorted(rows)]
+
+    def read(self, chat_name: Optional[str] = None, since: Optional[str] = None,
+             until: Optional[str] = None, limit: int = 1000, after: Optional[int] = None) -> Dict[str, Any]:
+        """Archived messages matching the filters, oldest first; pass next_cursor as after for the next page
+
+        Segments are opened in id order and reading stops once limit + 1
+        messages are found and no later segment can hold a smaller id, so a
+        page only decompresses the segments it needs.
+        """
+        segments = [
+            segment for segment in self.manifest().values()
+            if (after is None or segment["max_id"] > after)
+            and (chat_name is None or chat_name in segment["sessions"])
+            and not (since is not None and segment["end"] < since)
+            and not (until is not None and segment["start"] >= until)
+        ]
+        segments.sort(key=lambda segment: segment["min_id"])
+
+        messages: List[Dict[str, Any]] = []
+        for segment in segments:
+            if len(messages) > limit and segment["min_id"] > messages[limit]["id"]:
+                break
+            rows = self._segment_rows(segment, chat_name, since, until, after)
+            if rows:
+                # Id ranges of segments only overlap around midnight or for undated rows
+                messages = sorted({row["id"]: row for row in messages + rows}.values(),
+                                  key=lambda row: row["id"])[:limit + 1]
+
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+        return {
+            "messages": messages,
+            "has_more": has_more,
+            "next_cursor": messages[-1]["id"] if has_more else None
+        }
+
+    def drop_before(self, day: str) -> int:
+        """Delete segments of days before day (YYYY-MM-DD); returns the number of messages dropped"""
+        dropped = 0
+        with self._lock:
+            segments = self.manifest()
+            for segment_day in [d for d in segments if d < day]:
+                segment = segments.pop(segment_day)
+                (self.archive_dir / segment["file"]).unlink(missing_ok=True)
+                dropped += segment["count"]
+            if dropped:
+                self._save_manifest(segments)
+        return dropped
+
+    def stats(self) -> Dict[str, Any]:
+        segments = self.manifest()
+        return {
+            "segments": len(segments),
+            "messages": sum(segment["count"] for segment in segments.values()),
+            "bytes": sum((self.archive_dir / segment["file"]).stat().st_size
+                         for segment in segments.values() if (self.archive_dir / segment["file"]).exists()),
+        }
+
+
+class ChatHistoryRetention:
+    """Keep the SQLite store small by moving cold messages into the archive
+
+    hot_days, max_session_messages and max_total_messages bound what stays in
+    the database; archive_days bounds how long archived segments are kept.
+    A limit of 0 disables it, and every limit defaults to 0: archived
+    messages leave search, paging and session counts, so operators opt in.
+    """
+
+    def __init__(self, store: ChatHistoryStore, archive: ChatHistoryArchive, hot_days: int = 0,
+                 max_session_messages: int = 0, max_total_messages: int = 0, archive_days: int = 0):
+        self.store = store
+        self.archive = archive
+        self.hot_days = hot_days
+        self.max_session_messages = max_session_messages
+        self.max_total_messages = max_total_messages
+        self.archive_days = archive_days
+
+    def rotate(self) -> Dict[str, int]:
+        now = datetime.now()
+        before = (now - timedelta(days=self.hot_days)).isoformat() if self.hot_days > 0 else None
+        archived = self.store.archive_messages(
+            self.archive.write,
+            before=before,
+            max_session_messages=self.max_session_messages,
+            max_total_messages=self.max_total_messages
+        )
+        dropped = 0
+        if self.archive_days > 0:
+            dropped = self.archive.drop_before((now - timedelta(days=self.archive_days)).strftime("%Y-%m-%d"))
+        if archived or dropped:
+            logger.info(f"Chat history rotation: archived {archived} messages, dropped {dropped} expired")
+        return {"archived": archived, "dropped": dropped}
@@ -0,0 +1,361 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chat_name TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_chat ON messages (chat_name, id);
+CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages (timestamp);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    chat_name TEXT PRIMARY KEY,
+    message_count INTEGER NOT NULL,
+    first_id INTEGER NOT NULL,
+    last_id INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_last_id ON sessions (last_id);
+CREATE TRIGGER IF NOT EXISTS trg_messages_sessions AFTER INSERT ON messages
+BEGIN
+    INSERT INTO sessions (chat_name, message_count, first_id, last_id, created_at, updated_at)
+    VALUES (NEW.chat_name, 1, NEW.id, NEW.id, NEW.timestamp, NEW.timestamp)
+    ON CONFLICT (chat_name) DO UPDATE SET
+        message_count = message_count + 1,
+        last_id = NEW.id,
+        updated_at = NEW.timestamp;
+END;
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5 (
+    content,
+    content = 'messages',
+    content_rowid = 'id',
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS trg_messages_fts_insert AFTER INSERT ON messages
+BEGIN
+    INSERT INTO messages_fts (rowid, content) VALUES (NEW.id, {fold_new});
+END;
+CREATE TRIGGER IF NOT EXISTS trg_messages_fts_delete AFTER DELETE ON messages
+BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', OLD.id, {fold_old});
+END;
+"""
+
+# unicode61 strips diacritics but keeps "đ" as its own letter; index it as "d"
+# so "da nang" finds "Đà Nẵng". Same length, so snippet() offsets still line up.
+def _fold_sql(column: str) -> str:
+    return f"replace(replace({column}, 'đ', 'd'), 'Đ', 'D')"
+
+
+SCHEMA = SCHEMA.format(fold_new=_fold_sql("NEW.content"), fold_old=_fold_sql("OLD.content"))
+
+_FTS_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# (chat_name, role, content, timestamp)
+Record = Tuple[str, str, str, str]
+
+
+class ChatHistoryStore:
+    """Chat history in SQLite (WAL mode): appends are single-row inserts
+
+    Every thread gets its own connection. WAL lets readers run alongside a
+    writer, and writers (threads or uvicorn workers) queue on SQLite's lock
+    through busy_timeout instead of overwriting each other's files.
+    """
+
+    def __init__(self, db_path: Union[str, Path], busy_timeout: float = 30.0):
+        self.db_path = str(db_path)
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+        self._backfill_sessions()
+        self._backfill_fts()
+
+    def _backfill_fts(self):
+        """Index messages stored before the full-text index existed"""
+        with self._transaction() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'fts_indexed'").fetchone() is None:
+                conn.execute(f"INSERT INTO messages_fts (rowid, content) SELECT id, {_fold_sql('content')} FROM messages")
+                conn.execute("INSERT INTO meta (key, value) VALUES ('fts_indexed', ?)",
+                             (datetime.now().isoformat(),))
+
+    def _backfill_sessions(self):
+        """Build the sessions summary for a database created before it existed"""
+        with self._transaction() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'sessions_indexed'").fetchone() is None:
+                conn.execute("""
+                    INSERT OR REPLACE INTO sessions
+                    SELECT m.chat_name, s.message_count, s.first_id, s.last_id, f.timestamp, m.timestamp
+                    FROM (SELECT chat_name, COUNT(*) AS message_count, MIN(id) AS first_id, MAX(id) AS last_id
+                          FROM messages GROUP BY chat_name) AS s
+                    JOIN messages AS m ON m.id = s.last_id
+                    JOIN messages AS f ON f.id = s.first_id
+                """)
+                conn.execute("INSERT INTO meta (key, value) VALUES ('sessions_indexed', ?)",
+                             (datetime.now().isoformat(),))
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout,
+                                   isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self):
+        return _Transaction(self._connection())
+
+    @staticmethod
+    def make_record(chat_name: str, role: str, content: str, timestamp: Optional[str] = None) -> Record:
+        return (chat_name, role, content, timestamp or datetime.now().isoformat())
+
+    def append(self, chat_name: str, role: str, content: str, timestamp: Optional[str] = None) -> int:
+        """Append one message and return its id"""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "INSERT INTO messages (chat_name, role, content, timestamp) VALUES (?, ?, ?, ?)",
+                self.make_record(chat_name, role, content, timestamp)
+            )
+            return cursor.lastrowid
+
+    def append_many(self, records: Iterable[Record]) -> int:
+        """Append several (chat_name, role, content, timestamp) records in one transaction"""
+        records = list(records)
+        if records:
+            with self._transaction() as conn:
+                conn.executemany(
+                    "INSERT INTO messages (chat_name, role, content, timestamp) VALUES (?, ?, ?, ?)",
+                    records
+                )
+        return len(records)
+
+    def messages(self, chat_name: str) -> List[Dict[str, Any]]:
+        """All messages of one session, oldest first"""
+        rows = self._connection().execute(
+            "SELECT id, role, content, timestamp FROM messages WHERE chat_name = ? ORDER BY id",
+            (chat_name,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def list_sessions(self, limit: int = 50, before: Optional[int] = None) -> Dict[str, Any]:
+        """One page of sessions, most recently active first
+
+        before is the next_cursor of the previous page (a message id), so a
+        page is one range scan of the sessions index.
+        """
+        query = "SELECT * FROM sessions"
+        params: list = []
+        if before is not None:
+            query += " WHERE last_id < ?"
+            params.append(before)
+        query += " ORDER BY last_id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        rows = [dict(row) for row in self._connection().execute(query, params).fetchall()]
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            "sessions": rows,
+            "has_more": has_more,
+            "next_cursor": rows[-1]["last_id"] if has_more else None,
+        }
+
+    def page(self, chat_name: str, limit: int = 50, before: Optional[int] = None,
+             after: Optional[int] = None) -> Dict[str, Any]:
+        """One page of a session's messages, oldest first
+
+        Without a cursor the latest messages are returned. before=<id> pages
+        back in time and after=<id> pages forward; both are seeks on the
+        (chat_name, id) index, so the cost does not depend on history size.
+        """
+        conn = self._connection()
+        if after is not None:
+            rows = conn.execute(
+                "SELECT id, role, content, timestamp FROM messages WHERE chat_name = ? AND id > ? "
+                "ORDER BY id LIMIT ?",
+                (chat_name, after, limit + 1)
+            ).fetchall()
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+        else:
+            rows = conn.execute(
+                "SELECT id, role, content, timestamp FROM messages WHERE chat_name = ? AND id < ? "
+                "ORDER BY id DESC LIMIT ?",
+                (chat_name, before if before is not None else 2 ** 63 - 1, limit + 1)
+            ).fetchall()
+            has_more = len(rows) > limit
+            rows = rows[:limit][::-1]
+
+        messages = [dict(row) for row in rows]
+        return {
+            "chat_name": chat_name,
+            "messages": messages,
+            "has_more": has_more,
+            # before=<before_cursor> loads older messages, after=<after_cursor> newer ones
+            "before_cursor": messages[0]["id"] if messages else before,
+            "after_cursor": messages[-1]["id"] if messages else after,
+        }
+
+    def search(self, query: str, chat_name: Optional[str] = None, role: Optional[str] = None,
+               since: Optional[str] = None, until: Optional[str] = None,
+               limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+        """Messages containing every word of query, best BM25 match first
+
+        Matching ignores case and Vietnamese diacritics ("da nang" finds
+        "Đà Nẵng"). since/until are ISO timestamps, compared as strings.
+        """
+        terms = _FTS_TOKEN_RE.findall(query.replace("đ", "d").replace("Đ", "D"))
+        if not terms:
+            return {"query": query, "results": [], "has_more": False}
+        # Quote every word so user input is never parsed as FTS5 syntax
+        match = " ".join('"' + term + '"' for term in terms)
+
+        sql = ("SELECT m.id, m.chat_name, m.role, m.content, m.timestamp, "
+               "snippet(messages_fts, 0, '[', ']', '...', 16) AS snippet, "
+               "bm25(messages_fts) AS score "
+               "FROM messages_fts JOIN messages AS m ON m.id = messages_fts.rowid "
+               "WHERE messages_fts MATCH ?")
+        params: list = [match]
+        if chat_name is not None:
+            sql += " AND m.chat_name = ?"
+            params.append(chat_name)
+        if role is not None:
+            sql += " AND m.role = ?"
+            params.append(role)
+        if since is not None:
+            sql += " AND m.timestamp >= ?"
+            params.append(since)
+        if until is not None:
+            sql += " AND m.timestamp < ?"
+            params.append(until)
+        sql += " ORDER BY score LIMIT ? OFFSET ?"
+        params.extend([limit + 1, offset])
+
+        rows = [dict(row) for row in self._connection().execute(sql, params).fetchall()]
+        return {"query": query, "results": rows[:limit], "has_more": len(rows) > limit}
+
+    def archive_messages(self, sink: Callable[[List[Dict[str, Any]]], None], before: Optional[str] = None,
+                         max_session_messages: int = 0, max_total_messages: int = 0,
+                         batch_size: int = 50000) -> int:
+        """Move messages past the retention limits out of the database
+
+        A message is archived when its timestamp is older than before, when its
+        session has more than max_session_messages newer ones, or when more
+        than max_total_messages newer ones exist overall (0 disables a limit).
+        Each batch is handed to sink(rows) inside the write transaction and only
+        deleted once sink returns, so a failing sink loses nothing. The sessions
+        summary keeps describing the whole history, archived part included.
+        """
+        conditions, params = [], []
+        if before is not None:
+            conditions.append("SELECT id FROM messages WHERE timestamp < ?")
+            params.append(before)
+        if max_session_messages > 0:
+            conditions.append(
+                "SELECT id FROM (SELECT id, ROW_NUMBER() OVER (PARTITION BY chat_name ORDER BY id DESC) AS rn "
+                "FROM messages) WHERE rn > ?"
+            )
+            params.append(max_session_messages)
+        if max_total_messages > 0:
+            conditions.append(
+                "SELECT id FROM messages WHERE id <= (SELECT id FROM messages ORDER BY id DESC LIMIT 1 OFFSET ?)"
+            )
+            params.append(max_total_messages)
+        if not conditions:
+            return 0
+
+        sql = ("SELECT id, chat_name, role, content, timestamp FROM messages WHERE id IN ("
+               + " UNION ".join(conditions) + ") ORDER BY id LIMIT ?")
+        archived = 0
+        while True:
+            with self._transaction() as conn:
+                rows = [dict(row) for row in conn.execute(sql, params + [batch_size]).fetchall()]
+                if rows:
+                    sink(rows)
+                    conn.executemany("DELETE FROM messages WHERE id = ?", [(row["id"],) for row in rows])
+            archived += len(rows)
+            if len(rows) < batch_size:
+                break
+
+        if archived:
+            # Large deletes grow the WAL; checkpoint and truncate it
+            self._connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return archived
+
+    def migrate_json(self, json_path: Union[str, Path]) -> int:
+        """One-time import of the old chat_history.json ({chat_name: [messages]})
+
+        The import runs in a single transaction guarded by a meta flag, so
+        concurrent workers import it only once; the JSON file is then renamed
+        to *.migrated.
+        """
+        json_path = Path(json_path)
+        if not json_path.exists():
+            return 0
+
+        imported = 0
+        with self._transaction() as conn:
+            done = conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone()
+            if done is None:
+                with open(json_path, "r", encoding="utf-8") as f:
+                    history = json.load(f)
+                records = [
+                    self.make_record(chat_name, message.get("role", ""), message.get("content", ""),
+                                     message.get("timestamp"))
+                    for chat_name, messages in history.items()
+                    for message in messages
+                ]
+                conn.executemany(
+                    "INSERT INTO messages (chat_name, role, content, timestamp) VALUES (?, ?, ?, ?)",
+                    records
+                )
+                conn.execute("INSERT INTO meta (key, value) VALUES ('json_migrated', ?)",
+                             (datetime.now().isoformat(),))
+                imported = len(records)
+
+        try:
+            os.replace(json_path, json_path.with_name(json_path.name + ".migrated"))
+        except FileNotFoundError:
+            # Another worker renamed it first
+            pass
+        if imported:
+            logger.info(f"Migrated {imported} chat messages from {json_path} to {self.db_path}")
+        return imported
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT, rolled back on error"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.execute("COMMIT")
+        else:
+            self.conn.execute("ROLLBACK")
+        return False
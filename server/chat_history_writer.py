@@ -0,0 +1,112 @@
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+from chat_history_store import ChatHistoryStore
+
+logger = logging.getLogger(__name__)
+
+
+class ChatHistoryWriter:
+    """Write-behind queue in front of ChatHistoryStore
+
+    save() only timestamps the message and puts it on a bounded asyncio
+    queue; a background task writes queued messages in one transaction once
+    batch_size are waiting or flush_interval has passed since the first one.
+    When the queue is full, save() waits for room, which slows producers down
+    during spikes instead of growing memory without bound. flush() wakes the
+    task to write right away instead of waiting out flush_interval.
+    """
+
+    def __init__(self, store: ChatHistoryStore, max_queue_size: int = 10000,
+                 batch_size: int = 200, flush_interval: float = 0.5):
+        self.store = store
+        self.max_queue_size = max(1, max_queue_size)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(0.0, flush_interval)
+        self._queue: Optional[asyncio.Queue] = None
+        self._flush_requested: Optional[asyncio.Event] = None
+        self._worker = None
+        self.batches = 0
+        self.written = 0
+        self.failed = 0
+
+    async def save(self, chat_name: str, role: str, content: str):
+        """Queue one message; returns as soon as it is accepted"""
+        self._ensure_started()
+        await self._queue.put(self.store.make_record(chat_name, role, content))
+
+    async def flush(self):
+        """Wait until every message queued so far has been written"""
+        if self._queue is not None and self._worker is not None and not self._worker.done():
+            self._flush_requested.set()
+            await self._queue.join()
+
+    async def stop(self):
+        """Flush what is queued, then stop the background task"""
+        await self.flush()
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._queue is not None and self._queue.empty():
+            # The next save() may run on another event loop (e.g. the app is started again)
+            self._queue = self._flush_requested = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_size": self.max_queue_size,
+            "batches": self.batches,
+            "written": self.written,
+            "failed": self.failed,
+        }
+
+    def _ensure_started(self):
+        if self._worker is None or self._worker.done():
+            if self._queue is None:
+                self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+                self._flush_requested = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                while len(batch) < self.batch_size and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                timeout = deadline - loop.time()
+                if len(batch) >= self.batch_size or timeout <= 0 or self._flush_requested.is_set():
+                    break
+                # Wait for the next message, a flush() or the deadline, whichever comes first
+                getter = asyncio.ensure_future(self._queue.get())
+                flushed = asyncio.ensure_future(self._flush_requested.wait())
+                try:
+                    await asyncio.wait({getter, flushed}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    flushed.cancel()
+                    if not getter.done():
+                        # A cancelled get() leaves its message in the queue
+                        getter.cancel()
+                if getter.done() and not getter.cancelled():
+                    batch.append(getter.result())
+            await self._write(batch)
+            if self._queue.empty():
+                self._flush_requested.clear()
+
+    async def _write(self, batch):
+        try:
+            await asyncio.to_thread(self.store.append_many, batch)
+            self.batches += 1
+            self.written += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"Error writing {len(batch)} chat history messages: {str(e)}")
+        finally:
+            for _ in batch:
+                self._queue.task_done()
@@ -0,0 +1,123 @@
+import json
+import re
+import shutil
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+DATA_FILE = "data.parquet"
+META_FILE = "meta.json"
+# Small row groups let previews and pages read only the rows they show
+ROW_GROUP_SIZE = 10000
+_DATASET_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+class DatasetNotFound(KeyError):
+    pass
+
+
+def _uniform_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Object columns mixing scalar types (e.g. labels 1 and "pos") as strings, which Parquet can store"""
+    converted = {}
+    for column in df.columns:
+        if df[column].dtype != object:
+            continue
+        values = df[column][df[column].notna()]
+        types = set(values.map(type))
+        if len(types) > 1 and not any(issubclass(t, (list, tuple, dict)) or t.__module__ == "numpy" for t in types):
+            converted[column] = df[column].map(lambda v: str(v) if pd.notna(v) else None)
+    return df.assign(**converted) if converted else df
+
+
+class DatasetStore:
+    """Datasets kept server-side as Parquet files under opaque ids
+
+    Every processing step writes its output as a new dataset whose metadata
+    points at the dataset it was derived from, so the browser only passes ids
+    around and each version stays available.
+    """
+
+    def __init__(self, root: Union[str, Path]):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _dir(self, dataset_id: str) -> Path:
+        # Ids are generated here; anything else could be a path
+        if not isinstance(dataset_id, str) or not _DATASET_ID_RE.match(dataset_id):
+            raise DatasetNotFound(dataset_id)
+        path = self.root / dataset_id
+        if not (path / META_FILE).exists():
+            raise DatasetNotFound(dataset_id)
+        return path
+
+    def create(self, data: Union[pd.DataFrame, List[Dict[str, Any]]], parent_id: Optional[str] = None,
+               step: Optional[str] = None, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Store records (or a DataFrame) as a new dataset and return its metadata"""
+        df = data if isinstance(data, pd.DataFrame) else pd.DataFrame.from_records(data)
+        try:
+            table = pa.Table.from_pandas(_uniform_columns(df), preserve_index=False)
+        except pa.ArrowException as e:
+            # e.args: ("Could not convert ...", "Conversion failed for column label with type object")
+            raise ValueError("; ".join(str(arg) for arg in reversed(e.args)))
+
+        dataset_id = uuid.uuid4().hex
+        path = self.root / dataset_id
+        path.mkdir()
+        pq.write_table(table, path / DATA_FILE, row_group_size=ROW_GROUP_SIZE)
+
+        meta = {
+            "dataset_id": dataset_id,
+            "parent_id": parent_id,
+            "step": step,
+            "params": params or {},
+            "num_rows": table.num_rows,
+            "columns": table.column_names,
+            "created_at": datetime.now().isoformat(),
+        }
+        # meta.json is written last: a dataset without it does not exist yet
+        with open(path / META_FILE, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        return meta
+
+    def meta(self, dataset_id: str) -> Dict[str, Any]:
+        with open(self._dir(dataset_id) / META_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def load(self, dataset_id: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        return pq.read_table(self._dir(dataset_id) / DATA_FILE, columns=columns).to_pandas()
+
+    def rows(self, dataset_id: str, offset: int = 0, limit: int = 20) -> List[Dict[str, Any]]:
+        """A slice of the records, reading only the row groups that hold it"""
+        parquet_file = pq.ParquetFile(self._dir(dataset_id) / DATA_FILE)
+        rows, start = [], 0
+        for group in range(parquet_file.num_row_groups):
+            group_rows = parquet_file.metadata.row_group(group).num_rows
+            if start + group_rows > offset and len(rows) < limit:
+                table = parquet_file.read_row_group(group)
+                first = max(offset - start, 0)
+                rows.extend(table.slice(first, limit - len(rows)).to_pylist())
+            start += group_rows
+            if len(rows) >= limit:
+                break
+        return rows
+
+    def preview(self, dataset_id: str, limit: int = 20) -> Dict[str, Any]:
+        """Metadata plus the first records, which is all the browser needs to show a step"""
+        return {**self.meta(dataset_id), "preview": self.rows(dataset_id, 0, limit)}
+
+    def lineage(self, dataset_id: str) -> List[Dict[str, Any]]:
+        """Metadata of the dataset and every dataset it was derived from, newest first"""
+        chain = []
+        while dataset_id is not None:
+            meta = self.meta(dataset_id)
+            chain.append(meta)
+            dataset_id = meta["parent_id"]
+        return chain
+
+    def delete(self, dataset_id: str):
+        shutil.rmtree(self._dir(dataset_id))
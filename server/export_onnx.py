@@ -0,0 +1,120 @@
+"""Export the fine-tuned QA checkpoint to ONNX for CPU serving.
+
+    python export_onnx.py                      # -> phobert-finetuned-viquad2/onnx/model.onnx
+    python export_onnx.py --quantize           # + dynamic int8 model.int8.onnx
+    python export_onnx.py --quantize --verify 200
+
+--verify answers held-out UIT-ViQuAD validation questions with the PyTorch and
+ONNX backends of QAEngine and fails if the answers differ.
+"""
+import argparse
+import sys
+from pathlib import Path
+from typing import Dict, Iterable
+
+from qa_engine import ONNX_MODEL_NAME, ONNX_QUANTIZED_MODEL_NAME, ONNX_SUBDIR, QAEngine
+
+BASE_DIR = Path(__file__).parent
+DEFAULT_MODEL_DIR = BASE_DIR / "phobert-finetuned-viquad2"
+
+
+def export_onnx(model_dir: Path, output_path: Path, opset: int = 14) -> Path:
+    """Trace the checkpoint to ONNX with dynamic batch and sequence axes"""
+    import torch
+    from transformers import AutoModelForQuestionAnswering, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
+    model = AutoModelForQuestionAnswering.from_pretrained(str(model_dir)).eval()
+    model.config.return_dict = False
+
+    dummy = tokenizer("Câu hỏi?", "Ngữ cảnh mẫu để xuất mô hình.", return_tensors="pt")
+    input_names = [name for name in tokenizer.model_input_names if name in dummy]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes.update({"start_logits": {0: "batch", 1: "sequence"},
+                         "end_logits": {0: "batch", 1: "sequence"}})
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(dummy[name] for name in input_names),
+            str(output_path),
+            input_names=input_names,
+            output_names=["start_logits", "end_logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+        )
+    print(f"Exported ONNX model to {output_path}")
+    return output_path
+
+
+def quantize_onnx(onnx_path: Path, output_path: Path) -> Path:
+    """Dynamic int8 quantization of the exported weights"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(str(onnx_path), str(output_path), weight_type=QuantType.QInt8)
+    print(f"Quantized ONNX model saved to {output_path}")
+    return output_path
+
+
+def answer_agreement(expected_engine: QAEngine, actual_engine: QAEngine, examples: Iterable[Dict[str, str]],
+                     max_answer_len: int = 100) -> float:
+    """Share of {"question", "context"} examples where both engines give the same answer"""
+    matches, total = 0, 0
+    for example in examples:
+        expected = expected_engine(question=example["question"], context=example["context"], max_answer_len=max_answer_len)
+        actual = actual_engine(question=example["question"], context=example["context"], max_answer_len=max_answer_len)
+        total += 1
+        if expected["answer"] == actual["answer"]:
+            matches += 1
+        else:
+            print(f"Mismatch: {example['question']!r}: {expected['answer']!r} != {actual['answer']!r}")
+    return matches / total if total else 1.0
+
+
+def check_parity(model_dir: Path, onnx_path: Path, dataset: str, num_questions: int,
+                 max_answer_len: int = 100) -> float:
+    """Share of held-out ViQuAD questions where the ONNX answer equals the PyTorch answer"""
+    from datasets import load_dataset
+
+    split = load_dataset(dataset, split="validation")
+    split = split.select(range(min(num_questions, len(split))))
+
+    torch_engine = QAEngine(model_dir, backend="torch")
+    onnx_engine = QAEngine(model_dir, backend="onnx", onnx_path=onnx_path)
+
+    agreement = answer_agreement(torch_engine, onnx_engine, split, max_answer_len)
+    print(f"{onnx_path.name}: {agreement:.1%} of {len(split)} answers match PyTorch")
+    return agreement
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the fine-tuned QA model to ONNX")
+    parser.add_argument("--model-dir", type=Path, default=DEFAULT_MODEL_DIR)
+    parser.add_argument("--output-dir", type=Path, default=None,
+                        help=f"Defaults to <model-dir>/{ONNX_SUBDIR}")
+    parser.add_argument("--opset", type=int, default=14)
+    parser.add_argument("--quantize", action="store_true", help="Also write a dynamic int8 model")
+    parser.add_argument("--verify", type=int, default=0, metavar="N",
+                        help="Check answers against PyTorch on N ViQuAD validation questions")
+    parser.add_argument("--dataset", default="taidng/UIT-ViQuAD2.0")
+    parser.add_argument("--min-agreement", type=float, default=1.0,
+                        help="Minimum answer agreement required by --verify")
+    args = parser.parse_args()
+
+    output_dir = args.output_dir or args.model_dir / ONNX_SUBDIR
+    exported = [export_onnx(args.model_dir, output_dir / ONNX_MODEL_NAME, args.opset)]
+    if args.quantize:
+        exported.append(quantize_onnx(exported[0], output_dir / ONNX_QUANTIZED_MODEL_NAME))
+
+    if args.verify:
+        failed = False
+        for onnx_path in exported:
+            if check_parity(args.model_dir, onnx_path, args.dataset, args.verify) < args.min_agreement:
+                failed = True
+        if failed:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+
+
+def normalize_question(text: str) -> str:
+    """Normalize a question for lookups (NFC, lowercase, no punctuation, single spaces)"""
+    text = unicodedata.normalize("NFC", str(text)).lower()
+    text = _PUNCTUATION_RE.sub(" ", text)
+    return " ".join(text.split())
+
+
+class KnowledgeBaseMatcher:
+    """Find the knowledge base row whose Question is (nearly) the user's question"""
+
+    def __init__(self, df: pd.DataFrame, threshold: float = 0.9, ngram_range=(2, 4)):
+        self.threshold = threshold
+
+        df = df.dropna(subset=["Question", "Answer"])
+        self.questions = df["Question"].astype(str).tolist()
+        self.answers = df["Answer"].astype(str).tolist()
+        if "Category" in df.columns:
+            self.categories = df["Category"].astype(str).tolist()
+        else:
+            self.categories = [""] * len(self.questions)
+
+        normalized = [normalize_question(q) for q in self.questions]
+
+        # Exact lookup: normalized question -> first matching row
+        self.exact_index: Dict[str, int] = {}
+        for idx, question in enumerate(normalized):
+            if question:
+                self.exact_index.setdefault(question, idx)
+
+        # Fuzzy lookup: character n-gram TF-IDF over the normalized questions
+        self.vectorizer = None
+        self.question_matrix = None
+        if self.exact_index:
+            self.vectorizer = TfidfVectorizer(analyzer="char_wb", ngram_range=ngram_range)
+            self.question_matrix = self.vectorizer.fit_transform(normalized)
+
+    def match(self, question: str) -> Optional[Dict[str, Any]]:
+        """Return the matching KB row, or None if nothing clears the threshold"""
+        normalized = normalize_question(question)
+        if not normalized:
+            return None
+
+        idx = self.exact_index.get(normalized)
+        if idx is not None:
+            return self._result(idx, 1.0, "exact")
+
+        if self.vectorizer is None:
+            return None
+
+        scores = cosine_similarity(
+            self.vectorizer.transform([normalized]),
+            self.question_matrix
+        ).ravel()
+        best = int(scores.argmax())
+        if scores[best] >= self.threshold:
+            return self._result(best, float(scores[best]), "similarity")
+        return None
+
+    def top_passages(self, question: str, n: int = 5) -> List[Dict[str, Any]]:
+        """The n KB rows whose questions are most similar to the user's question"""
+        normalized = normalize_question(question)
+        if not normalized or self.vectorizer is None:
+            return []
+
+        scores = cosine_similarity(
+            self.vectorizer.transform([normalized]),
+            self.question_matrix
+        ).ravel()
+        passages, seen = [], set()
+        for idx in scores.argsort()[::-1]:
+            # Several questions can share one answer; keep each passage once
+            if self.answers[idx] in seen:
+                continue
+            seen.add(self.answers[idx])
+            passages.append(self._result(int(idx), float(scores[idx]), "retrieval"))
+            if len(passages) >= n:
+                break
+        return passages
+
+    def _result(self, idx: int, score: float, match_type: str) -> Dict[str, Any]:
+        return {
+            "question": self.questions[idx],
+            "answer": self.answers[idx],
+            "category": self.categories[idx],
+            "score": score,
+            "match_type": match_type,
+        }
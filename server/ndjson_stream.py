@@ -0,0 +1,124 @@
+import json
+import logging
+import tempfile
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+NDJSON_CHUNK_SIZE = 2000
+MAX_LINE_BYTES = 1024 * 1024
+# Request bodies up to this size are spooled in memory, larger ones in a temporary file
+SPOOL_MEMORY_BYTES = 8 * 1024 * 1024
+READ_BLOCK_BYTES = 64 * 1024
+
+
+def is_ndjson(request: Request) -> bool:
+    return request.headers.get("content-type", "").split(";")[0].strip() == NDJSON_MEDIA_TYPE
+
+
+class NdjsonReader:
+    """Read an NDJSON request body one line at a time
+
+    The first line may be a header object with an "options" key (plus any
+    endpoint settings such as "task"); every other line is one record, either
+    an object like {"text": ..., "label": ...} or a bare JSON string. Only the
+    current chunk of records is held in memory.
+
+    The body is spooled (in memory, then a temporary file) by read_header(),
+    before the response starts: while a StreamingResponse streams, Starlette
+    listens on receive() for a disconnect and would swallow the remaining
+    body messages.
+    """
+
+    def __init__(self, request: Request, chunk_size: int = NDJSON_CHUNK_SIZE):
+        self.request = request
+        self.chunk_size = chunk_size
+        self._body: Optional[tempfile.SpooledTemporaryFile] = None
+        self._lines = self._iter_lines()
+        self._pending: Optional[Any] = None
+        self.records_read = 0
+
+    async def _spool(self):
+        self._body = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES)
+        async for data in self.request.stream():
+            self._body.write(data)
+        self._body.seek(0)
+
+    async def _iter_lines(self) -> AsyncIterator[Any]:
+        if self._body is None:
+            await self._spool()
+        buffer = b""
+        line_number = 0
+        try:
+            for data in iter(lambda: self._body.read(READ_BLOCK_BYTES), b""):
+                buffer += data
+                *lines, buffer = buffer.split(b"\n")
+                if len(buffer) > MAX_LINE_BYTES:
+                    raise HTTPException(status_code=413, detail=f"NDJSON line longer than {MAX_LINE_BYTES} bytes")
+                for line in lines:
+                    line_number += 1
+                    if line.strip():
+                        yield self._parse(line, line_number)
+            if buffer.strip():
+                yield self._parse(buffer, line_number + 1)
+        finally:
+            self._body.close()
+
+    @staticmethod
+    def _parse(line: bytes, line_number: int) -> Any:
+        try:
+            return json.loads(line)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON on NDJSON line {line_number}: {e}")
+
+    async def read_header(self) -> Dict[str, Any]:
+        """Receive the whole body, then consume the header line if there is one (call before chunks())"""
+        await self._spool()
+        async for first in self._lines:
+            if isinstance(first, dict) and "options" in first and "text" not in first:
+                return first
+            self._pending = first
+            break
+        return {}
+
+    async def chunks(self) -> AsyncIterator[List[Any]]:
+        chunk = []
+        if self._pending is not None:
+            chunk.append(self._pending)
+            self._pending = None
+        async for record in self._lines:
+            chunk.append(record)
+            if len(chunk) >= self.chunk_size:
+                self.records_read += len(chunk)
+                yield chunk
+                chunk = []
+        if chunk:
+            self.records_read += len(chunk)
+            yield chunk
+
+
+def ndjson_response(results: AsyncIterator[Dict[str, Any]],
+                    summary: Optional[Callable[[], Dict[str, Any]]] = None) -> StreamingResponse:
+    """Stream result objects as NDJSON lines, ending with a {"done": true, "count": ...} line
+
+    An error after streaming has started can no longer change the status
+    code, so it is reported as a final {"error": ...} line instead.
+    """
+    async def body():
+        count = 0
+        try:
+            async for result in results:
+                count += 1
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+        except Exception as e:
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            logger.error(f"Error while streaming NDJSON: {detail}")
+            yield json.dumps({"error": detail, "count": count}, ensure_ascii=False) + "\n"
+            return
+        yield json.dumps({"done": True, "count": count, **(summary() if summary else {})}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(body(), media_type=NDJSON_MEDIA_TYPE)
@@ -0,0 +1,171 @@
+import argparse
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+
+class QABatcher:
+    """Collect concurrent QA requests and answer them with one batched forward pass
+
+    Requests are queued until either max_batch_size items are waiting or
+    max_wait_ms has passed since the first one arrived. The whole batch is then
+    handed to batch_fn(questions, contexts, **kwargs) in a worker thread, so the
+    event loop keeps accepting requests while the model runs.
+    """
+
+    def __init__(self, batch_fn: Callable[..., List[Dict[str, Any]]],
+                 max_batch_size: int = 16, max_wait_ms: float = 5.0):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue = None
+        self._worker = None
+        # Items taken off the queue whose futures are not resolved yet
+        self._batch: List[tuple] = []
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, question: str, context: Any, **kwargs) -> Dict[str, Any]:
+        """Queue one (question, context) pair and wait for its answer
+
+        The context is passed to batch_fn as is (e.g. a list of passages).
+        """
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((question, context, kwargs, future))
+        return await future
+
+    async def stop(self):
+        """Stop the worker and fail anything still waiting, including the batch being answered"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        pending = self._batch
+        self._batch = []
+        while self._queue is not None and not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for *_, future in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("QA batcher stopped"))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+        }
+
+    def _ensure_started(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._batch = batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._process(batch)
+            self._batch = []
+
+    async def _process(self, batch):
+        # Requests with different call options (e.g. max_answer_len) can't share a call
+        groups: Dict[tuple, list] = {}
+        for item in batch:
+            groups.setdefault(tuple(sorted(item[2].items())), []).append(item)
+
+        for options, items in groups.items():
+            questions = [item[0] for item in items]
+            contexts = [item[1] for item in items]
+            try:
+                results = await asyncio.to_thread(self.batch_fn, questions, contexts, **dict(options))
+            except Exception as e:
+                for *_, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(items)
+            for (*_, future), result in zip(items, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+def run_pipeline_batch(qa_pipeline, questions: List[str], contexts: List[str], **kwargs) -> List[Dict[str, Any]]:
+    """Answer a batch of (question, context) pairs with one padded pipeline call"""
+    results = qa_pipeline(
+        question=questions,
+        context=contexts,
+        batch_size=len(questions),
+        **kwargs
+    )
+    # The pipeline unwraps single-item inputs
+    return [results] if isinstance(results, dict) else results
+
+
+async def _benchmark(batch_fn, users: int, requests_per_user: int, batcher: QABatcher = None) -> Tuple[float, float]:
+    """(requests/s, p95 latency in ms) of users sending requests_per_user requests one after another"""
+    question = "UIT được thành lập khi nào?"
+    context = ("Trường Đại học Công nghệ Thông tin (UIT) là một trường đại học thành viên của "
+               "Đại học Quốc gia Thành phố Hồ Chí Minh, được thành lập vào ngày 8 tháng 6 năm 2006. "
+               "Trường chuyên đào tạo về lĩnh vực công nghệ thông tin và truyền thông.")
+    latencies = []
+
+    async def user():
+        for _ in range(requests_per_user):
+            sent = time.perf_counter()
+            if batcher is not None:
+                await batcher.submit(question, context)
+            else:
+                await asyncio.to_thread(batch_fn, [question], [context])
+            latencies.append(time.perf_counter() - sent)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(users)))
+    elapsed = time.perf_counter() - start
+    if batcher is not None:
+        await batcher.stop()
+    latencies.sort()
+    return len(latencies) / elapsed, latencies[int(len(latencies) * 0.95)] * 1000
+
+
+if __name__ == "__main__":
+    from pathlib import Path
+    from transformers import pipeline
+
+    parser = argparse.ArgumentParser(description="Throughput of the QA endpoint with and without micro-batching")
+    parser.add_argument("--model-dir", default=str(Path(__file__).parent / "phobert-finetuned-viquad2"))
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests-per-user", type=int, default=8)
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    qa_pipeline = pipeline("question-answering", model=args.model_dir, tokenizer=args.model_dir)
+
+    def batch_fn(questions, contexts, **kwargs):
+        return run_pipeline_batch(qa_pipeline, questions, contexts, **kwargs)
+
+    print(f"{'users':>5} {'unbatched req/s':>16} {'p95 ms':>8} {'batched req/s':>14} {'p95 ms':>8}")
+    for users in args.users:
+        unbatched, unbatched_p95 = asyncio.run(_benchmark(batch_fn, users, args.requests_per_user))
+        batched, batched_p95 = asyncio.run(_benchmark(
+            batch_fn, users, args.requests_per_user,
+            QABatcher(batch_fn, args.max_batch_size, args.max_wait_ms)
+        ))
+        print(f"{users:>5} {unbatched:>16.1f} {unbatched_p95:>8.1f} {batched:>14.1f} {batched_p95:>8.1f}")
@@ -0,0 +1,354 @@
+import argparse
+import random
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Tuple, Union
+
+import numpy as np
+from transformers import AutoTokenizer
+
+ONNX_SUBDIR = "onnx"
+ONNX_MODEL_NAME = "model.onnx"
+ONNX_QUANTIZED_MODEL_NAME = "model.int8.onnx"
+
+
+class TorchQABackend:
+    """Eager PyTorch forward pass of an AutoModelForQuestionAnswering checkpoint"""
+
+    def __init__(self, model_dir: Union[str, Path]):
+        import torch
+        from transformers import AutoModelForQuestionAnswering
+
+        self.torch = torch
+        self.model = AutoModelForQuestionAnswering.from_pretrained(str(model_dir)).eval()
+
+    def __call__(self, inputs: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        with self.torch.inference_mode():
+            outputs = self.model(**{name: self.torch.from_numpy(value) for name, value in inputs.items()})
+        return outputs.start_logits.float().numpy(), outputs.end_logits.float().numpy()
+
+
+class OnnxQABackend:
+    """Forward pass of an exported QA model under onnxruntime (CPU)"""
+
+    def __init__(self, onnx_path: Union[str, Path], num_threads: int = 0):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(str(onnx_path), options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def __call__(self, inputs: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        feeds = {name: inputs[name].astype(np.int64) for name in self.input_names}
+        start_logits, end_logits = self.session.run(["start_logits", "end_logits"], feeds)
+        return start_logits, end_logits
+
+
+def decode_spans(start_logits: np.ndarray, end_logits: np.ndarray, desired: np.ndarray,
+                 max_answer_len: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Best answer span of every feature, vectorized over the batch
+
+    Follows the transformers question-answering pipeline: logits outside the
+    desired tokens (context + CLS) are masked before the softmax, the first
+    token's probability is zeroed, and a span's score is p_start * p_end over
+    spans with start <= end < start + max_answer_len.
+
+    Returns (starts, ends, scores), each of shape (num_features,).
+    """
+    start = np.where(desired, start_logits, -10000.0)
+    end = np.where(desired, end_logits, -10000.0)
+
+    start = np.exp(start - start.max(axis=-1, keepdims=True))
+    start = start / start.sum(axis=-1, keepdims=True)
+    end = np.exp(end - end.max(axis=-1, keepdims=True))
+    end = end / end.sum(axis=-1, keepdims=True)
+    start[:, 0] = 0.0
+    end[:, 0] = 0.0
+
+    seq_len = start.shape[1]
+    offsets = np.arange(seq_len)[None, :] - np.arange(seq_len)[:, None]
+    band = (offsets >= 0) & (offsets < max_answer_len)
+
+    candidates = start[:, :, None] * end[:, None, :] * band[None, :, :]
+    flat = candidates.reshape(candidates.shape[0], -1).argmax(axis=-1)
+    starts, ends = np.unravel_index(flat, (seq_len, seq_len))
+    scores = candidates[np.arange(candidates.shape[0]), starts, ends]
+    return starts, ends, scores
+
+
+class QAEngine:
+    """Extractive QA over the fine-tuned checkpoint with a pluggable forward backend
+
+    Called like the transformers question-answering pipeline
+    (question=..., context=..., max_answer_len=...) and returns the same
+    {"score", "start", "end", "answer"} dicts: like the pipeline's default
+    align_to_words=True, answers are widened to whole words. Tokenization
+    and span post-processing are shared by every backend so their answers
+    match.
+    """
+
+    def __init__(self, model_dir: Union[str, Path], backend: str = "torch", onnx_path=None,
+                 max_length: int = 384, doc_stride: int = 128, forward_batch_size: int = 4):
+        model_dir = Path(model_dir)
+        self.forward_batch_size = max(1, forward_batch_size)
+        self.tokenizer = AutoTokenizer.from_pretrained(str(model_dir), use_fast=True)
+        self.max_length = min(max_length, self.tokenizer.model_max_length)
+        self.doc_stride = min(doc_stride, self.max_length // 2)
+        self.backend_name = backend
+        self._context_cache: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+
+        # Special tokens around (question, context), e.g. <s> q </s></s> c </s>
+        template = self.tokenizer.build_inputs_with_special_tokens([-1], [-2])
+        question_pos, context_pos = template.index(-1), template.index(-2)
+        self._prefix = template[:question_pos]
+        self._middle = template[question_pos + 1:context_pos]
+        self._suffix = template[context_pos + 1:]
+        self._num_special_tokens = len(template) - 2
+
+        if backend == "onnx":
+            self.backend = OnnxQABackend(onnx_path or model_dir / ONNX_SUBDIR / ONNX_MODEL_NAME)
+        elif backend == "torch":
+            self.backend = TorchQABackend(model_dir)
+        else:
+            raise ValueError(f"Unknown QA backend: {backend}")
+
+    def pretokenize_contexts(self, contexts: Iterable[str]):
+        """Tokenize the knowledge base contexts once, so requests only tokenize the question
+
+        Replaces the previous cache, so calling it again after a KB reload drops
+        contexts that no longer exist.
+        """
+        self._context_cache = {context: self._tokenize_context(context) for context in contexts if context}
+
+    def __call__(self, question: Union[str, List[str]], context: Union[str, List[str]],
+                 max_answer_len: int = 15, **kwargs) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+        # batch_size and other pipeline kwargs are accepted for compatibility:
+        # every (question, context) window is run in one forward pass.
+        single = isinstance(question, str)
+        questions = [question] if single else list(question)
+        contexts = [context] * len(questions) if isinstance(context, str) else list(context)
+
+        features = self._encode(questions, contexts)
+        start_logits, end_logits = self._forward(features["inputs"])
+
+        starts, ends, scores = self._decode(features, start_logits, end_logits, max_answer_len)
+
+        # Best span per sample across all of its windows
+        results = []
+        for sample_idx, context in enumerate(contexts):
+            sample_features = np.flatnonzero(features["sample_mapping"] == sample_idx)
+            best = sample_features[np.argmax(scores[sample_features])]
+            results.append(self._answer(features, best, starts[best], ends[best], scores[best], context))
+        return results[0] if single else results
+
+    def answer_from_passages(self, question: str, passages: List[str], max_answer_len: int = 15) -> Dict[str, Any]:
+        """Best answer span across several passages, run as one padded batch
+
+        Every passage is split into doc_stride windows, all windows go through a
+        single forward pass and the best-scoring span over the whole batch wins.
+        """
+        return self.answer_from_passages_batch([question], [passages], max_answer_len)[0]
+
+    def answer_from_passages_batch(self, questions: List[str], passage_lists: List[List[str]],
+                                   max_answer_len: int = 15) -> List[Dict[str, Any]]:
+        """answer_from_passages() for several questions, with all their windows in one forward pass"""
+        pair_questions = [question for question, passages in zip(questions, passage_lists) for _ in passages]
+        pair_passages = [passage for passages in passage_lists for passage in passages]
+        first_pair = np.cumsum([0] + [len(passages) for passages in passage_lists])
+        owner = np.repeat(np.arange(len(questions)), np.diff(first_pair))
+
+        features = self._encode(pair_questions, pair_passages)
+        start_logits, end_logits = self._forward(features["inputs"])
+        starts, ends, scores = self._decode(features, start_logits, end_logits, max_answer_len)
+
+        feature_owner = owner[features["sample_mapping"]]
+        results = []
+        for question_idx in range(len(questions)):
+            candidates = np.flatnonzero(feature_owner == question_idx)
+            best = candidates[np.argmax(scores[candidates])]
+            pair_idx = int(features["sample_mapping"][best])
+            result = self._answer(features, best, starts[best], ends[best], scores[best], pair_passages[pair_idx])
+            result["passage_index"] = pair_idx - int(first_pair[question_idx])
+            results.append(result)
+        return results
+
+    def _tokenize_context(self, context: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Token ids, token character offsets and the character span of each token's word"""
+        encoded = self.tokenizer(context, add_special_tokens=False, return_offsets_mapping=True)
+        offsets = np.asarray(encoded["offset_mapping"], dtype=np.int64).reshape(-1, 2)
+        word_offsets = offsets.copy()
+        try:
+            word_ids = encoded.word_ids()
+        except ValueError:
+            # Slow tokenizers have no word ids; the pipeline keeps token offsets then
+            word_ids = []
+        spans: Dict[int, Tuple[int, int]] = {}
+        for token, word in enumerate(word_ids):
+            if word is not None:
+                start, end = spans.get(word, offsets[token])
+                spans[word] = (min(start, offsets[token, 0]), max(end, offsets[token, 1]))
+        for token, word in enumerate(word_ids):
+            if word is not None:
+                word_offsets[token] = spans[word]
+        return np.asarray(encoded["input_ids"], dtype=np.int64), offsets, word_offsets
+
+    def _encode(self, questions: List[str], contexts: List[str]) -> Dict[str, Any]:
+        """Build padded doc_stride windows of [special] question [special] context [special]
+
+        Only the questions are tokenized here; contexts come from the
+        pre-tokenized cache when available. The result matches tokenizing the
+        pairs with truncation="only_second" and return_overflowing_tokens=True.
+        """
+        question_ids = self.tokenizer(questions, add_special_tokens=False)["input_ids"]
+        with_token_types = "token_type_ids" in self.tokenizer.model_input_names
+
+        windows, masks, offsets, word_offsets, token_types, sample_mapping = [], [], [], [], [], []
+        for sample_idx, (q_ids, context) in enumerate(zip(question_ids, contexts)):
+            cached = self._context_cache.get(context)
+            ctx_ids, ctx_offsets, ctx_word_offsets = cached if cached is not None else self._tokenize_context(context)
+
+            q_ids = q_ids[:self.max_length // 2]
+            budget = self.max_length - len(q_ids) - self._num_special_tokens
+            stride = min(self.doc_stride, budget - 1)
+            prefix = self._prefix + q_ids + self._middle
+
+            window_start = 0
+            while True:
+                window_ids = ctx_ids[window_start:window_start + budget]
+                ids = np.concatenate([prefix, window_ids, self._suffix]).astype(np.int64)
+
+                mask = np.zeros(len(ids), dtype=bool)
+                mask[len(prefix):len(prefix) + len(window_ids)] = True
+                window_offsets = np.zeros((len(ids), 2), dtype=np.int64)
+                window_offsets[mask] = ctx_offsets[window_start:window_start + budget]
+                window_word_offsets = np.zeros((len(ids), 2), dtype=np.int64)
+                window_word_offsets[mask] = ctx_word_offsets[window_start:window_start + budget]
+
+                windows.append(ids)
+                masks.append(mask)
+                offsets.append(window_offsets)
+                word_offsets.append(window_word_offsets)
+                sample_mapping.append(sample_idx)
+                if with_token_types:
+                    token_types.append(self.tokenizer.create_token_type_ids_from_sequences(q_ids, window_ids.tolist()))
+
+                if window_start + budget >= len(ctx_ids):
+                    break
+                window_start += budget - stride
+
+        seq_len = max(len(ids) for ids in windows)
+        num_features = len(windows)
+        input_ids = np.full((num_features, seq_len), self.tokenizer.pad_token_id, dtype=np.int64)
+        attention_mask = np.zeros((num_features, seq_len), dtype=np.int64)
+        context_mask = np.zeros((num_features, seq_len), dtype=bool)
+        offset_mapping = np.zeros((num_features, seq_len, 2), dtype=np.int64)
+        word_offset_mapping = np.zeros((num_features, seq_len, 2), dtype=np.int64)
+        for i, ids in enumerate(windows):
+            input_ids[i, :len(ids)] = ids
+            attention_mask[i, :len(ids)] = 1
+            context_mask[i, :len(ids)] = masks[i]
+            offset_mapping[i, :len(ids)] = offsets[i]
+            word_offset_mapping[i, :len(ids)] = word_offsets[i]
+
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if with_token_types:
+            token_type_ids = np.zeros((num_features, seq_len), dtype=np.int64)
+            for i, types in enumerate(token_types):
+                token_type_ids[i, :len(types)] = types
+            inputs["token_type_ids"] = token_type_ids
+
+        return {
+            "inputs": inputs,
+            "context_mask": context_mask,
+            "offset_mapping": offset_mapping,
+            "word_offset_mapping": word_offset_mapping,
+            "sample_mapping": np.asarray(sample_mapping),
+        }
+
+    def _forward(self, inputs: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """Start/end logits of every window, run in length-sorted chunks of forward_batch_size
+
+        On CPU one large padded batch is slower than a few small ones (its
+        attention tensors no longer fit in cache), and sorting the windows by
+        length lets each chunk drop most of its padding.
+        """
+        lengths = inputs["attention_mask"].sum(axis=1)
+        order = np.argsort(-lengths, kind="stable")
+        start_logits = np.full(inputs["input_ids"].shape, -10000.0, dtype=np.float32)
+        end_logits = start_logits.copy()
+        for i in range(0, len(order), self.forward_batch_size):
+            chunk = order[i:i + self.forward_batch_size]
+            width = int(lengths[chunk].max())
+            start_logits[chunk, :width], end_logits[chunk, :width] = self.backend(
+                {name: value[chunk, :width] for name, value in inputs.items()})
+        return start_logits, end_logits
+
+    def _decode(self, features: Dict[str, Any], start_logits: np.ndarray, end_logits: np.ndarray,
+                max_answer_len: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        inputs = features["inputs"]
+        desired = ((features["context_mask"] | (inputs["input_ids"] == self.tokenizer.cls_token_id))
+                   & (inputs["attention_mask"] == 1))
+        return decode_spans(start_logits, end_logits, desired, max_answer_len)
+
+    def _answer(self, features: Dict[str, Any], feature_idx: int, start: int, end: int,
+                score: float, context: str) -> Dict[str, Any]:
+        # align_to_words: the answer starts at its first word's start and ends at its last word's end
+        start_char = int(features["word_offset_mapping"][feature_idx, start, 0])
+        end_char = int(features["word_offset_mapping"][feature_idx, end, 1])
+        return {
+            "score": float(score),
+            "start": start_char,
+            "end": end_char,
+            "answer": context[start_char:end_char],
+        }
+
+
+_SENTENCES = [
+    "Trường Đại học Công nghệ Thông tin được thành lập vào ngày 8 tháng 6 năm 2006.",
+    "Trường là thành viên của Đại học Quốc gia Thành phố Hồ Chí Minh.",
+    "Sinh viên có thể đăng ký học phần trực tuyến trong hai tuần đầu của học kỳ.",
+    "Thư viện mở cửa từ bảy giờ sáng đến chín giờ tối, kể cả thứ bảy.",
+    "Học phí được đóng theo từng học kỳ qua ngân hàng hoặc cổng thanh toán của trường.",
+    "Ký túc xá nằm trong khu đô thị Đại học Quốc gia, cách trường khoảng năm phút đi bộ.",
+    "Chương trình tiên tiến được giảng dạy hoàn toàn bằng tiếng Anh.",
+    "Điểm rèn luyện được đánh giá vào cuối mỗi học kỳ dựa trên hoạt động của sinh viên.",
+]
+
+
+def _sample_passages(num_passages: int, sentences_per_passage: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(_SENTENCES, k=sentences_per_passage)) for _ in range(num_passages)]
+
+
+def _benchmark(engine: "QAEngine", passage_counts: List[int], sentences_per_passage: int, repeats: int):
+    """Latency of one multi-passage call against one call per passage, one after another"""
+    question = "Thư viện mở cửa lúc mấy giờ?"
+    print(f"{'passages':>8} {'sequential ms':>14} {'one batch ms':>13} {'same answer':>12}")
+    for num_passages in passage_counts:
+        passages = _sample_passages(num_passages, sentences_per_passage)
+        engine.answer_from_passages(question, passages)  # warm-up
+        sequential, batched = [], []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            answers = [engine(question=question, context=passage) for passage in passages]
+            sequential.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            best = engine.answer_from_passages(question, passages)
+            batched.append(time.perf_counter() - start)
+        same = max(answers, key=lambda answer: answer["score"])["answer"] == best["answer"]
+        print(f"{num_passages:>8} {np.median(sequential) * 1000:>14.1f} {np.median(batched) * 1000:>13.1f} "
+              f"{str(same):>12}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-passage QA: one padded batch vs one call per passage")
+    parser.add_argument("--model-dir", default=str(Path(__file__).parent / "phobert-finetuned-viquad2"))
+    parser.add_argument("--backend", default="torch", choices=["torch", "onnx"])
+    parser.add_argument("--passages", type=int, nargs="+", default=[1, 3, 5, 10])
+    parser.add_argument("--sentences-per-passage", type=int, default=6)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    _benchmark(QAEngine(args.model_dir, backend=args.backend), args.passages, args.sentences_per_passage, args.repeats)
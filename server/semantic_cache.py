@@ -0,0 +1,76 @@
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+
+class SemanticCache:
+    """Answers keyed by question embeddings, looked up by cosine similarity
+
+    Embeddings live in one preallocated float32 matrix, so a lookup is a
+    single matrix-vector product over at most max_size rows. Entries expire
+    after ttl seconds; when the cache is full the oldest entry is replaced.
+    """
+
+    def __init__(self, dim: int, threshold: float = 0.92, ttl: float = 600.0, max_size: int = 1000):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_size = max_size
+        self._vectors = np.zeros((max_size, dim), dtype=np.float32)
+        self._entries: list = [None] * max_size
+        self._created = np.full(max_size, -np.inf)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.latency_saved = 0.0
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, embedding) -> Optional[Dict[str, Any]]:
+        """The cached entry most similar to embedding, if it clears the threshold and is fresh"""
+        vector = self._normalize(embedding)
+        with self._lock:
+            fresh = time.monotonic() - self._created < self.ttl
+            if fresh.any():
+                scores = np.where(fresh, self._vectors @ vector, -np.inf)
+                best = int(scores.argmax())
+                if scores[best] >= self.threshold:
+                    entry = self._entries[best]
+                    self.hits += 1
+                    self.latency_saved += entry["latency"]
+                    return {**entry, "similarity": float(scores[best])}
+            self.misses += 1
+            return None
+
+    def add(self, embedding, question: str, answer: str, latency: float):
+        """Store an answer together with the upstream latency a later hit will save"""
+        with self._lock:
+            # Reuse an expired slot, otherwise the oldest one
+            slot = int(self._created.argmin())
+            self._vectors[slot] = self._normalize(embedding)
+            self._entries[slot] = {"question": question, "answer": answer, "latency": latency}
+            self._created[slot] = time.monotonic()
+
+    def clear(self):
+        with self._lock:
+            self._entries = [None] * self.max_size
+            self._created[:] = -np.inf
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": int(np.count_nonzero(time.monotonic() - self._created < self.ttl)),
+                "max_size": self.max_size,
+                "threshold": self.threshold,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "latency_saved_ms": round(self.latency_saved * 1000, 1),
+            }
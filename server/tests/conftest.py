@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+# app.py creates its stores at import time; keep them out of the source tree
+_DATA_DIR = tempfile.mkdtemp(prefix="nlp-server-tests-")
+os.environ.setdefault("DATASETS_DIR", os.path.join(_DATA_DIR, "datasets"))
+os.environ.setdefault("CHAT_HISTORY_DB", os.path.join(_DATA_DIR, "chat_history.db"))
+os.environ.setdefault("CHAT_HISTORY_ARCHIVE_DIR", os.path.join(_DATA_DIR, "chat_history_archive"))
@@ -0,0 +1,56 @@
+from chat_history_archive import ChatHistoryArchive, ChatHistoryRetention
+from chat_history_store import ChatHistoryStore
+
+
+def _rows(start_id, count, day, chat_name="s1"):
+    return [{"id": i, "chat_name": chat_name, "role": "user", "content": f"message {i}",
+             "timestamp": f"{day}T{i % 24:02d}:00:00"} for i in range(start_id, start_id + count)]
+
+
+def test_read_pages_in_id_order(tmp_path):
+    archive = ChatHistoryArchive(tmp_path)
+    archive.write(_rows(1, 30, "2024-01-01") + _rows(31, 30, "2024-01-02", "s2"))
+    archive.write(_rows(61, 30, "2024-01-03"))
+
+    ids, after = [], None
+    while True:
+        page = archive.read(limit=25, after=after)
+        ids.extend(row["id"] for row in page["messages"])
+        if not page["has_more"]:
+            assert page["next_cursor"] is None
+            break
+        after = page["next_cursor"]
+    assert ids == list(range(1, 91))
+
+    page = archive.read(chat_name="s2", limit=10)
+    assert [row["id"] for row in page["messages"]] == list(range(31, 41))
+    assert page["has_more"] and page["next_cursor"] == 40
+
+
+def test_read_stops_at_the_segments_it_needs(tmp_path, monkeypatch):
+    archive = ChatHistoryArchive(tmp_path)
+    for day in range(1, 11):
+        archive.write(_rows(day * 100, 50, f"2024-01-{day:02d}"))
+
+    opened = []
+    segment_rows = archive._segment_rows
+    monkeypatch.setattr(archive, "_segment_rows", lambda segment, *args: opened.append(segment["file"])
+                        or segment_rows(segment, *args))
+    page = archive.read(limit=60)
+    assert len(page["messages"]) == 60 and page["has_more"]
+    assert opened == ["2024-01-01.jsonl.gz", "2024-01-02.jsonl.gz"]
+
+
+def test_read_skips_messages_archived_twice(tmp_path):
+    archive = ChatHistoryArchive(tmp_path)
+    archive.write(_rows(1, 5, "2024-01-01"))
+    archive.write(_rows(3, 5, "2024-01-01"))
+    assert [row["id"] for row in archive.read()["messages"]] == list(range(1, 8))
+
+
+def test_retention_is_off_by_default(tmp_path):
+    store = ChatHistoryStore(tmp_path / "chat.db")
+    store.append_many([store.make_record("s1", "user", f"m{i}") for i in range(5)])
+    archive = ChatHistoryArchive(tmp_path / "archive")
+    assert ChatHistoryRetention(store, archive).rotate() == {"archived": 0, "dropped": 0}
+    assert archive.stats()["messages"] == 0
@@ -0,0 +1,21 @@
+import time
+import uuid
+
+import pytest
+
+app_module = pytest.importorskip("app")
+from fastapi.testclient import TestClient
+
+
+def test_search_sees_a_message_saved_just_before_without_waiting():
+    chat_name = f"search-{uuid.uuid4().hex}"
+    with TestClient(app_module.app) as client:
+        client.portal.call(app_module.save_chat_history, chat_name, "user", "Thành phố Đà Nẵng ở đâu?")
+        start = time.perf_counter()
+        response = client.get("/api/chat/history/search", params={"q": "da nang", "chat_name": chat_name})
+        elapsed = time.perf_counter() - start
+
+    assert response.status_code == 200
+    assert [result["content"] for result in response.json()["results"]] == ["Thành phố Đà Nẵng ở đâu?"]
+    # The pending message is committed on flush(), not after CHAT_HISTORY_FLUSH_MS
+    assert elapsed < app_module.CHAT_HISTORY_FLUSH_MS / 1000.0
@@ -0,0 +1,38 @@
+import asyncio
+import time
+
+from chat_history_store import ChatHistoryStore
+from chat_history_writer import ChatHistoryWriter
+
+
+def test_flush_writes_without_waiting_for_the_interval(tmp_path):
+    async def main():
+        writer = ChatHistoryWriter(ChatHistoryStore(str(tmp_path / "history.db")), flush_interval=5.0)
+        await writer.save("s1", "user", "xin chào")
+        await asyncio.sleep(0.01)
+        start = time.perf_counter()
+        await writer.flush()
+        elapsed = time.perf_counter() - start
+        await writer.save("s1", "assistant", "chào bạn")
+        await writer.flush()
+        stats = writer.stats()
+        await writer.stop()
+        return elapsed, stats
+
+    elapsed, stats = asyncio.run(main())
+    assert elapsed < 1.0
+    assert stats["written"] == 2 and stats["queued"] == 0
+
+
+def test_messages_are_still_batched_until_the_interval(tmp_path):
+    async def main():
+        writer = ChatHistoryWriter(ChatHistoryStore(str(tmp_path / "history.db")), flush_interval=0.2)
+        for i in range(5):
+            await writer.save("s1", "user", f"tin nhắn {i}")
+        await asyncio.sleep(0.5)
+        stats = writer.stats()
+        await writer.stop()
+        return stats
+
+    stats = asyncio.run(main())
+    assert stats["batches"] == 1 and stats["written"] == 5
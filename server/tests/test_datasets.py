@@ -0,0 +1,30 @@
+import pytest
+
+from dataset_store import DatasetStore
+
+app_module = pytest.importorskip("app")
+from fastapi.testclient import TestClient
+
+client = TestClient(app_module.app)
+
+
+def test_store_keeps_mixed_labels_as_strings(tmp_path):
+    store = DatasetStore(tmp_path)
+    meta = store.create([{"text": "a", "label": 1}, {"text": "b", "label": "pos"}, {"text": "c"}])
+    assert store.rows(meta["dataset_id"], 0, 10) == [
+        {"text": "a", "label": "1"},
+        {"text": "b", "label": "pos"},
+        {"text": "c", "label": None},
+    ]
+
+
+def test_upload_with_mixed_labels():
+    response = client.post("/datasets", json={"data": [{"text": "a", "label": 1}, {"text": "b", "label": "pos"}]})
+    assert response.status_code == 200
+    assert [row["label"] for row in response.json()["preview"]] == ["1", "pos"]
+
+
+def test_upload_with_unstorable_column_is_a_400():
+    response = client.post("/datasets", json={"data": [{"text": "a", "tags": ["x"]}, {"text": "b", "tags": "y"}]})
+    assert response.status_code == 400
+    assert "column tags" in response.json()["detail"]
@@ -0,0 +1,139 @@
+"""/api/chat/general against a local fake OpenAI-compatible server
+
+The server answers POST /v1/chat/completions like the real API: a JSON
+completion, or with "stream": true a text/event-stream of chunks ending in
+"data: [DONE]". A user message containing "fail" gets an error event in the
+middle of the stream, which the OpenAI client raises as APIError.
+"""
+import json
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+app_module = pytest.importorskip("app")
+from fastapi.testclient import TestClient
+from openai import AsyncOpenAI
+
+REPLY = ["Xin ", "chào", " bạn!"]
+
+
+def _completion_chunk(delta):
+    return {"id": "chatcmpl-test", "object": "chat.completion.chunk", "created": 0, "model": "fake",
+            "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+
+
+class _FakeOpenAI(BaseHTTPRequestHandler):
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        if self.path != "/v1/chat/completions":
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.requests.append(body)
+
+        if not body.get("stream"):
+            payload = json.dumps({
+                "id": "chatcmpl-test", "object": "chat.completion", "created": 0, "model": "fake",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "".join(REPLY)}}],
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        events = [_completion_chunk({"role": "assistant", "content": ""})]
+        events += [_completion_chunk({"content": text}) for text in REPLY]
+        if "fail" in body["messages"][-1]["content"]:
+            events.insert(2, {"error": {"message": "upstream overloaded", "type": "server_error"}})
+        for event in events:
+            self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+
+
+@pytest.fixture(scope="module")
+def fake_openai():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeOpenAI)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(fake_openai, monkeypatch):
+    monkeypatch.setattr(app_module, "aiml_async_client", AsyncOpenAI(base_url=fake_openai, api_key="test"))
+    with TestClient(app_module.app) as client:
+        yield client
+
+
+def _events(body: str):
+    """(event, data) of every Server-Sent Event in a response body"""
+    events = []
+    for block in body.split("\n\n"):
+        if not block:
+            continue
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields.get("event"), json.loads(fields["data"])))
+    return events
+
+
+def _saved(client, chat_name):
+    client.portal.call(app_module.chat_history_writer.flush)
+    return [(m["role"], m["content"]) for m in app_module.chat_history_store.messages(chat_name)]
+
+
+def test_general_chat_streams_sse_and_saves_the_reply(client):
+    chat_name = f"general-{uuid.uuid4().hex}"
+    response = client.post("/api/chat/general", json={
+        "messages": [{"role": "user", "content": "Chào bạn"}], "chat_name": chat_name, "stream": True})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["cache-control"] == "no-cache"
+    assert response.text.endswith("\n\n")
+    assert _events(response.text) == [(None, {"delta": text}) for text in REPLY] + \
+        [("done", {"message": "Xin chào bạn!"})]
+
+    sent = _FakeOpenAI.requests[-1]
+    assert sent["stream"] is True
+    assert [m["role"] for m in sent["messages"]] == ["system", "user"]
+    # Saved by the BackgroundTask once the stream has been sent
+    assert _saved(client, chat_name) == [("assistant", "Xin chào bạn!")]
+
+
+def test_general_chat_stream_error_event_saves_nothing(client):
+    chat_name = f"general-{uuid.uuid4().hex}"
+    response = client.post("/api/chat/general", json={
+        "messages": [{"role": "user", "content": "please fail"}], "chat_name": chat_name, "stream": True})
+
+    assert response.status_code == 200
+    events = _events(response.text)
+    assert events[0] == (None, {"delta": "Xin "})
+    assert events[-1][0] == "error" and "upstream overloaded" in events[-1][1]["error"]
+    assert not any(event == "done" for event, _ in events)
+    assert _saved(client, chat_name) == []
+
+
+def test_general_chat_without_stream(client):
+    chat_name = f"general-{uuid.uuid4().hex}"
+    response = client.post("/api/chat/general", json={
+        "messages": [{"role": "user", "content": "Chào bạn"}], "chat_name": chat_name})
+
+    assert response.status_code == 200
+    assert response.json() == {"message": "Xin chào bạn!"}
+    assert _saved(client, chat_name) == [("assistant", "Xin chào bạn!")]
@@ -0,0 +1,68 @@
+import asyncio
+import json
+
+import pytest
+
+app_module = pytest.importorskip("app")
+
+
+async def _post_ndjson(path, lines, chunk_size=97):
+    """Drive the ASGI app directly, delivering the body in many small http.request messages
+
+    Like uvicorn, receive() keeps answering after the body ends: it blocks
+    until the response is complete and then reports http.disconnect.
+    """
+    body = "".join(json.dumps(line, ensure_ascii=False) + "\n" for line in lines).encode("utf-8")
+    messages = [{"type": "http.request", "body": body[i:i + chunk_size], "more_body": True}
+                for i in range(0, len(body), chunk_size)]
+    messages.append({"type": "http.request", "body": b"", "more_body": False})
+    response_complete = asyncio.Event()
+    status, chunks = None, []
+
+    async def receive():
+        if messages:
+            await asyncio.sleep(0)  # let the response task run between body messages
+            return messages.pop(0)
+        await response_complete.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                response_complete.set()
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.3"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": b"", "server": ("testserver", 80), "client": ("testclient", 50000),
+        "headers": [(b"host", b"testserver"), (b"content-type", b"application/x-ndjson"),
+                    (b"content-length", str(len(body)).encode())],
+    }
+    await asyncio.wait_for(app_module.app(scope, receive, send), timeout=60)
+    return status, [json.loads(line) for line in b"".join(chunks).decode("utf-8").splitlines()]
+
+
+def test_clean_data_ndjson_multi_chunk_body():
+    records = [{"text": f"Row {i}: hello, world!! #{i}"} for i in range(200)]
+    status, lines = asyncio.run(_post_ndjson("/clean-data", [{"options": {"remove_numbers": False}}] + records))
+
+    assert status == 200
+    assert lines[-1] == {"done": True, "count": 200}
+    assert [line["text"] for line in lines[:-1]] == [f"Row {i} hello world {i}" for i in range(200)]
+
+
+def test_clean_data_ndjson_exact_dedup_summary():
+    records = [{"text": "same text"}, {"text": "Same text!"}, {"text": "other"}] * 50
+    status, lines = asyncio.run(_post_ndjson("/clean-data", [{"options": {"dedup": "exact"}}] + records))
+
+    assert status == 200
+    assert [line["text"] for line in lines[:-1]] == ["same text", "other"]
+    summary = lines[-1]
+    assert summary["count"] == 2
+    assert summary["dedup"]["rows_in"] == 150
+    assert summary["dedup"]["rows_removed"] == 148
+    assert summary["dedup"]["merged_truncated"] is False
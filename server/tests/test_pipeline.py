@@ -0,0 +1,27 @@
+import pytest
+
+app_module = pytest.importorskip("app")
+from fastapi.testclient import TestClient
+
+client = TestClient(app_module.app)
+
+
+def test_pipeline_records_with_missing_label():
+    response = client.post("/pipeline", json={
+        "stages": [{"name": "clean", "options": {}}],
+        "data": [{"text": "Hello, world!", "label": "greeting"}, {"text": "No label here..."}, "bare string"],
+    })
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["data"] == [
+        {"text": "Hello world", "label": "greeting"},
+        {"text": "No label here", "label": None},
+        {"text": "bare string", "label": None},
+    ]
+    assert [timing["stage"] for timing in body["timings"]] == ["clean"]
+
+
+def test_pipeline_rejects_unknown_stage():
+    response = client.post("/pipeline", json={"stages": [{"name": "translate"}], "data": ["x"]})
+    assert response.status_code == 400
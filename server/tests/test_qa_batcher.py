@@ -0,0 +1,47 @@
+import asyncio
+import threading
+
+from qa_batcher import QABatcher
+
+
+def test_concurrent_requests_share_a_batch():
+    calls = []
+
+    def batch_fn(questions, contexts, **kwargs):
+        calls.append(len(questions))
+        return [{"answer": question.upper()} for question in questions]
+
+    async def main():
+        batcher = QABatcher(batch_fn, max_batch_size=4, max_wait_ms=50)
+        results = await asyncio.gather(*(batcher.submit(f"q{i}", "context") for i in range(4)))
+        await batcher.stop()
+        return results
+
+    assert [result["answer"] for result in asyncio.run(main())] == ["Q0", "Q1", "Q2", "Q3"]
+    assert calls == [4]
+
+
+def test_stop_fails_the_batch_in_flight_and_the_queue():
+    started, release = threading.Event(), threading.Event()
+
+    def batch_fn(questions, contexts, **kwargs):
+        started.set()
+        release.wait(5)
+        return [{"answer": ""} for _ in questions]
+
+    async def main():
+        batcher = QABatcher(batch_fn, max_batch_size=2, max_wait_ms=0)
+        in_flight = [asyncio.create_task(batcher.submit(f"q{i}", "context")) for i in range(2)]
+        await asyncio.to_thread(started.wait, 5)
+        queued = asyncio.create_task(batcher.submit("q2", "context"))
+        await asyncio.sleep(0.01)
+        await batcher.stop()
+        try:
+            return await asyncio.wait_for(asyncio.gather(*in_flight, queued, return_exceptions=True), 5)
+        finally:
+            release.set()
+
+    results = asyncio.run(main())
+    assert len(results) == 3
+    for result in results:
+        assert isinstance(result, RuntimeError) and str(result) == "QA batcher stopped"
@@ -0,0 +1,14 @@
+import pytest
+
+app_module = pytest.importorskip("app")
+from fastapi.testclient import TestClient
+
+client = TestClient(app_module.app)
+
+
+@pytest.mark.parametrize("path, body", [
+    ("/api/fine-tuned-qa", {"message": "Học phí?", "sessionId": "s1", "mode": "multi-passage"}),
+    ("/api/chat/fine-tuned", {"message": "Học phí?", "sessionId": "s1", "mode": "passages"}),
+])
+def test_qa_mode_typo_is_rejected(path, body):
+    assert client.post(path, json=body).status_code == 422
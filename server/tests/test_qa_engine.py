@@ -0,0 +1,160 @@
+"""QAEngine against the transformers question-answering pipeline it replaces
+
+The fixture is a tiny randomly initialised XLM-RoBERTa QA model with a
+SentencePiece-style Unigram fast tokenizer trained on a few sentences, built
+locally so the test needs no download. Random logits pick arbitrary spans,
+which often start or end inside a word: exactly what align_to_words handles.
+"""
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+tokenizers = pytest.importorskip("tokenizers")
+
+from qa_engine import QAEngine
+
+CORPUS = [
+    "Thành phố Đà Nẵng nằm ở miền Trung Việt Nam, bên bờ biển Đông.",
+    "Hà Nội là thủ đô của Việt Nam và có lịch sử hơn một nghìn năm.",
+    "Sông Hồng chảy qua nhiều tỉnh phía Bắc trước khi đổ ra biển.",
+    "The university library opens at eight o'clock and closes at midnight.",
+    "Students can borrow at most five books for two weeks.",
+    "Phở là món ăn nổi tiếng, thường được ăn vào buổi sáng.",
+]
+QUESTIONS = [
+    "Đà Nẵng nằm ở đâu?",
+    "Thủ đô của Việt Nam là gì?",
+    "When does the library close?",
+    "How many books can students borrow?",
+    "Phở thường được ăn khi nào?",
+]
+
+
+@pytest.fixture(scope="module")
+def model_dir(tmp_path_factory):
+    from tokenizers import Tokenizer, decoders, models, normalizers, pre_tokenizers, processors, trainers
+    from transformers import XLMRobertaConfig, XLMRobertaForQuestionAnswering, XLMRobertaTokenizerFast
+
+    backend = Tokenizer(models.Unigram())
+    backend.normalizer = normalizers.NFKC()
+    backend.pre_tokenizer = pre_tokenizers.Metaspace()
+    backend.decoder = decoders.Metaspace()
+    special = ["<s>", "<pad>", "</s>", "<unk>", "<mask>"]
+    backend.train_from_iterator(CORPUS * 20, trainers.UnigramTrainer(
+        vocab_size=150, special_tokens=special, unk_token="<unk>"))
+    backend.post_processor = processors.TemplateProcessing(
+        single="<s> $A </s>", pair="<s> $A </s> </s> $B </s>",
+        special_tokens=[(token, backend.token_to_id(token)) for token in ("<s>", "</s>")])
+    tokenizer = XLMRobertaTokenizerFast(tokenizer_object=backend, model_max_length=512)
+
+    torch.manual_seed(0)
+    config = XLMRobertaConfig(
+        vocab_size=backend.get_vocab_size(), hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+        intermediate_size=64, max_position_embeddings=520, pad_token_id=tokenizer.pad_token_id,
+        bos_token_id=tokenizer.bos_token_id, eos_token_id=tokenizer.eos_token_id)
+    path = tmp_path_factory.mktemp("tiny-xlmr-qa")
+    XLMRobertaForQuestionAnswering(config).eval().save_pretrained(str(path))
+    tokenizer.save_pretrained(str(path))
+    return path
+
+
+@pytest.fixture(scope="module")
+def qa_pipeline(model_dir):
+    return transformers.pipeline("question-answering", model=str(model_dir), tokenizer=str(model_dir))
+
+
+@pytest.fixture(scope="module")
+def engine(model_dir):
+    return QAEngine(model_dir, backend="torch")
+
+
+@pytest.mark.parametrize("max_answer_len", [3, 15])
+def test_answers_match_the_pipeline(engine, qa_pipeline, max_answer_len):
+    contexts = [" ".join(CORPUS)] + CORPUS[:3]
+    for context in contexts:
+        for question in QUESTIONS:
+            expected = qa_pipeline(question=question, context=context, max_answer_len=max_answer_len)
+            actual = engine(question=question, context=context, max_answer_len=max_answer_len)
+            assert (actual["start"], actual["end"], actual["answer"]) == \
+                   (expected["start"], expected["end"], expected["answer"]), (question, context)
+            assert actual["score"] == pytest.approx(expected["score"], rel=1e-4)
+
+
+def test_answers_are_whole_words(engine):
+    context = CORPUS[0]
+    for question in QUESTIONS:
+        answer = engine(question=question, context=context)
+        # Metaspace offsets include the space before a word
+        start = answer["start"] + len(answer["answer"]) - len(answer["answer"].lstrip())
+        end = answer["end"] - len(answer["answer"]) + len(answer["answer"].rstrip())
+        assert start == 0 or not context[start - 1].isalnum()
+        assert end == len(context) or not context[end].isalnum()
+
+
+def test_pretokenized_contexts_give_the_same_answers(model_dir, engine):
+    cached = QAEngine(model_dir, backend="torch")
+    cached.pretokenize_contexts(CORPUS)
+    for context in CORPUS:
+        for question in QUESTIONS:
+            assert cached(question=question, context=context) == engine(question=question, context=context)
+
+
+def test_onnx_backend_matches_torch(model_dir, engine, tmp_path):
+    """The --verify parity check of export_onnx.py, on the fixture instead of ViQuAD"""
+    pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    from export_onnx import answer_agreement, export_onnx
+
+    onnx_path = export_onnx(model_dir, tmp_path / "model.onnx")
+    onnx_engine = QAEngine(model_dir, backend="onnx", onnx_path=onnx_path)
+    examples = [{"question": question, "context": context} for context in CORPUS for question in QUESTIONS]
+    assert answer_agreement(engine, onnx_engine, examples) == 1.0
+
+
+def test_answer_from_passages_batch_is_the_best_span_per_question(engine):
+    questions = QUESTIONS[:3]
+    passage_lists = [CORPUS[:3], CORPUS[2:], [" ".join(CORPUS)] + CORPUS[:1]]
+    results = engine.answer_from_passages_batch(questions, passage_lists, max_answer_len=15)
+
+    for question, passages, result in zip(questions, passage_lists, results):
+        single = engine.answer_from_passages(question, passages, max_answer_len=15)
+        answers = [engine(question=question, context=passage, max_answer_len=15) for passage in passages]
+        best = max(range(len(passages)), key=lambda i: answers[i]["score"])
+        assert result["passage_index"] == single["passage_index"] == best
+        assert result["answer"] == single["answer"] == answers[best]["answer"]
+        assert result["score"] == pytest.approx(answers[best]["score"], rel=1e-4)
+
+
+def test_forward_chunks_do_not_change_answers(model_dir, engine):
+    one_batch = QAEngine(model_dir, backend="torch", forward_batch_size=64)
+    contexts = [" ".join(CORPUS)] + CORPUS
+    for question in QUESTIONS:
+        expected = one_batch(question=[question] * len(contexts), context=contexts)
+        actual = engine(question=[question] * len(contexts), context=contexts)
+        assert [a["answer"] for a in actual] == [e["answer"] for e in expected]
+        assert [a["score"] for a in actual] == pytest.approx([e["score"] for e in expected], rel=1e-4)
+
+
+def test_multi_passage_answers_go_through_the_batcher(engine, monkeypatch):
+    import asyncio
+    from types import SimpleNamespace
+
+    app_module = pytest.importorskip("app")
+    passages = [{"answer": text, "category": f"cat{i}"} for i, text in enumerate(CORPUS)]
+    monkeypatch.setattr(app_module, "qa_pipeline", engine)
+    monkeypatch.setattr(app_module, "kb_matcher", SimpleNamespace(top_passages=lambda question, n: passages[:n]))
+    batcher = app_module.QABatcher(app_module.run_qa_batch, max_batch_size=8, max_wait_ms=20)
+    monkeypatch.setattr(app_module, "qa_batcher", batcher)
+
+    async def main():
+        results = await asyncio.gather(*(app_module.answer_from_top_passages(question) for question in QUESTIONS[:3]))
+        await batcher.stop()
+        return results
+
+    results = asyncio.run(main())
+    assert batcher.stats()["batches"] == 1 and batcher.stats()["items"] == 3
+    texts = [passage["answer"] for passage in passages[:app_module.QA_TOP_PASSAGES]]
+    for question, result in zip(QUESTIONS[:3], results):
+        expected = engine.answer_from_passages(question, texts)
+        assert result["answer"] == expected["answer"]
+        assert result["category"] == passages[expected["passage_index"]]["category"]
@@ -0,0 +1,61 @@
+import random
+
+import numpy as np
+import pytest
+
+from text_dedup import (ExactDedupStream, _brute_force_pairs, _num_clusters, _sample_texts, _UnionFind,
+                        minhash_signatures, near_duplicate_pairs)
+
+
+def _clusters(texts, threshold=0.8):
+    """Near-duplicate clusters as sets of texts, so they can be compared across input orders"""
+    signatures = minhash_signatures(texts)
+    clusters = _UnionFind(len(texts))
+    for i, j in near_duplicate_pairs(signatures, threshold):
+        clusters.union(i, j)
+    groups = {}
+    for i, text in enumerate(texts):
+        groups.setdefault(clusters.find(i), set()).add(text)
+    return {frozenset(group) for group in groups.values()}
+
+
+def test_lsh_finds_the_same_clusters_as_all_pairs():
+    texts = list(dict.fromkeys(_sample_texts(1500)))
+    signatures = minhash_signatures(texts)
+    assert _num_clusters(len(texts), near_duplicate_pairs(signatures, 0.8)) == \
+        _num_clusters(len(texts), _brute_force_pairs(signatures, 0.8))
+
+
+def test_clusters_do_not_depend_on_input_order():
+    texts = list(dict.fromkeys(_sample_texts(1500)))
+    expected = _clusters(texts)
+    for seed in range(3):
+        shuffled = texts[:]
+        random.Random(seed).shuffle(shuffled)
+        assert _clusters(shuffled) == expected
+
+
+def test_chained_near_duplicates_share_a_cluster():
+    # b is close to a and to c, a and c are not: every order must give one cluster
+    a = np.arange(128, dtype=np.uint32)
+    b = a.copy()
+    b[::10] += 1000
+    c = b.copy()
+    c[5::10] += 1000
+    assert (a == b).mean() >= 0.85 and (b == c).mean() >= 0.85 and (a == c).mean() < 0.85
+    for order in ([a, b, c], [a, c, b], [c, a, b], [b, c, a]):
+        pairs = near_duplicate_pairs(np.vstack(order), 0.85)
+        assert _num_clusters(3, pairs) == 1
+
+
+def test_exact_stream_caps_its_report_and_state():
+    stream = ExactDedupStream(max_unique_rows=3, max_merged=2)
+    kept = [stream.add(text) for text in ["a b", "A  b!", "c", "a b", "c"]]
+    assert kept == [True, False, True, False, False]
+    assert stream.rows_in == 5 and stream.rows_removed == 3
+    assert stream.merged == [{"index": 1, "duplicate_of": 0, "match": "exact"},
+                             {"index": 3, "duplicate_of": 0, "match": "exact"}]
+
+    stream.add("d")
+    with pytest.raises(ValueError):
+        stream.add("e")
@@ -0,0 +1,57 @@
+import pytest
+
+nltk_tokenize_module = pytest.importorskip("nltk.tokenize")
+
+from text_tokenizers import regex_tokenize, vietnamese_tokenize
+
+# Each text as the sentences Punkt splits it into: word_tokenize runs the
+# Treebank rules on every sentence, which is what regex_tokenize must match
+SENTENCES = [
+    ["The cats are running across the gardens and jumping over fences."],
+    ["She said, \"I don't think we'll make it before 10:30 tonight.\""],
+    ["Mr. Smith paid $1,250.50 for the new laptop (including tax)."],
+    ["It's raining, so the children aren't playing outside today!"],
+    ["Can you believe it?", "The U.S. economy grew 3.5% last quarter..."],
+    ["We're going to the state-of-the-art museum; they've opened a new wing."],
+    ["Email support@example.com or call us at 555-0100 -- we're open 24/7."],
+    ["I gave the book to Dr. Lee.", "She liked it."],
+    ["J. R. R. Tolkien wrote it in 1937."],
+    ["It works.", "It is fast."],
+    ["I cannot wait, gonna be fun: 'tis the season."],
+    # Sentence-final abbreviations: the last period is split off like any other
+    ["We bought apples, pears, etc."],
+    ["He moved to the U.S."],
+    ["Meet me at 5 p.m."],
+    ["The meeting is at 10 a.m. on Monday."],
+    # ...and split off mid-text when Punkt breaks after them
+    ["We bought apples, pears, etc.", "The rest was cheap."],
+    ["Meet me at 5 p.m.", "They will wait."],
+    ["It opened on Jan. 5.", "The line was long."],
+    ["We counted 12. it was enough."],  # no break before a lowercase word
+]
+
+
+def _expected(sentences):
+    return [token for sentence in sentences
+            for token in nltk_tokenize_module.word_tokenize(sentence, preserve_line=True)]
+
+
+@pytest.mark.parametrize("sentences", SENTENCES, ids=lambda sentences: sentences[0][:30])
+def test_regex_tokenize_matches_the_treebank_rules(sentences):
+    assert regex_tokenize(" ".join(sentences)) == _expected(sentences)
+
+
+@pytest.mark.parametrize("sentences", SENTENCES, ids=lambda sentences: sentences[0][:30])
+def test_regex_tokenize_matches_word_tokenize(sentences):
+    try:
+        nltk_tokenize_module.sent_tokenize("Punkt.")
+    except LookupError:
+        pytest.skip("The NLTK Punkt model is not installed")
+    text = " ".join(sentences)
+    assert regex_tokenize(text) == nltk_tokenize_module.word_tokenize(text)
+
+
+def test_vietnamese_tokenize_keeps_numbers_urls_and_emails():
+    assert vietnamese_tokenize("Giá 1.250.000 đồng, email hotro@congty.vn hoặc https://congty.vn.") == [
+        "Giá", "1.250.000", "đồng", ",", "email", "hotro@congty.vn", "hoặc", "https://congty.vn", ".",
+    ]
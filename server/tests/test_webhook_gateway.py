@@ -0,0 +1,151 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from webhook_gateway import CircuitBreaker, CircuitOpenError, UpstreamStatusError, WebhookGateway
+
+
+def _gateway(handler, **kwargs):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=kwargs.pop("reset_timeout", 30.0))
+    kwargs.setdefault("retries", 0)
+    return WebhookGateway("http://webhook.test/chat", breaker=breaker,
+                          transport=httpx.MockTransport(handler), **kwargs)
+
+
+def test_repeated_500_opens_the_breaker():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(500, text="boom")
+
+    async def run():
+        gateway = _gateway(handler)
+        for _ in range(3):
+            with pytest.raises(UpstreamStatusError):
+                await gateway.get_text({"message": "hi"})
+        with pytest.raises(CircuitOpenError):
+            await gateway.get_text({"message": "hi"})
+        assert gateway.breaker.state == "open"
+        await gateway.aclose()
+
+    asyncio.run(run())
+    assert len(calls) == 3
+
+
+def test_4xx_keeps_the_breaker_closed():
+    async def run():
+        gateway = _gateway(lambda request: httpx.Response(404, text="no such hook"))
+        for _ in range(5):
+            with pytest.raises(UpstreamStatusError):
+                await gateway.get_text({"message": "hi"})
+        assert gateway.breaker.state == "closed"
+        await gateway.aclose()
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("error", [RuntimeError("unexpected"), asyncio.CancelledError()])
+def test_trial_call_ending_in_other_errors_releases_the_breaker(error):
+    outcomes = iter([error, None])
+
+    async def handler(request):
+        outcome = next(outcomes)
+        if outcome is not None:
+            raise outcome
+        return httpx.Response(200, text="ok")
+
+    async def run():
+        gateway = _gateway(handler, reset_timeout=0.0)
+        gateway.breaker.opened_at = 0.0  # open, and past reset_timeout: half-open
+        with pytest.raises(type(error)):
+            await gateway.get_text({"message": "trial"})
+        assert gateway.breaker.state == "half_open"
+        assert await gateway.get_text({"message": "next trial"}) == "ok"
+        assert gateway.breaker.state == "closed"
+        await gateway.aclose()
+
+    asyncio.run(run())
+
+
+def test_read_timeout_is_not_retried():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        raise httpx.ReadTimeout("webhook too slow", request=request)
+
+    async def run():
+        gateway = _gateway(handler, retries=2, backoff_base=0.0)
+        with pytest.raises(httpx.ReadTimeout):
+            await gateway.get_text({"message": "hi"})
+        assert gateway.breaker.failures == 1
+        await gateway.aclose()
+
+    asyncio.run(run())
+    assert len(calls) == 1
+
+
+def test_connect_error_is_retried():
+    outcomes = iter(["refused", "refused", "ok"])
+
+    def handler(request):
+        if next(outcomes) == "refused":
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(200, text="ok")
+
+    async def run():
+        gateway = _gateway(handler, retries=2, backoff_base=0.0)
+        assert await gateway.get_text({"message": "hi"}) == "ok"
+        assert gateway.breaker.failures == 0
+        await gateway.aclose()
+
+    asyncio.run(run())
+
+
+def test_retries_stop_at_the_deadline(monkeypatch):
+    monkeypatch.setattr("webhook_gateway.random.uniform", lambda low, high: high)
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(503, text="busy")
+
+    async def run():
+        gateway = _gateway(handler, retries=5, backoff_base=0.2, backoff_max=0.2, deadline=0.3)
+        start = time.perf_counter()
+        with pytest.raises(UpstreamStatusError):
+            await gateway.get_text({"message": "hi"})
+        await gateway.aclose()
+        return time.perf_counter() - start
+
+    assert asyncio.run(run()) < 0.3
+    assert len(calls) == 2
+
+
+def test_backoff_does_not_hold_a_concurrency_slot(monkeypatch):
+    monkeypatch.setattr("webhook_gateway.random.uniform", lambda low, high: high)
+    calls = []
+
+    def handler(request):
+        message = request.url.params["message"]
+        calls.append(message)
+        if message == "a" and calls.count("a") == 1:
+            return httpx.Response(503, text="busy")
+        return httpx.Response(200, text=message)
+
+    async def run():
+        gateway = _gateway(handler, retries=1, max_concurrency=1, backoff_base=0.2, backoff_max=0.2)
+        first = asyncio.create_task(gateway.get_text({"message": "a"}))
+        await asyncio.sleep(0.05)  # "a" got its 503 and is backing off
+        start = time.perf_counter()
+        assert await gateway.get_text({"message": "b"}) == "b"
+        waited = time.perf_counter() - start
+        assert await first == "a"
+        await gateway.aclose()
+        return waited
+
+    assert asyncio.run(run()) < 0.1
+    assert calls == ["a", "b", "a"]
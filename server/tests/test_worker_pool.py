@@ -0,0 +1,17 @@
+import asyncio
+
+import worker_pool
+from text_cleaning import clean_texts, options_key
+
+
+def test_pool_does_not_fork_the_server():
+    try:
+        pool = worker_pool.get_process_pool()
+        assert pool._mp_context.get_start_method() in ("forkserver", "spawn")
+
+        texts = [f"Row {i}: Hello,   World {i}!" for i in range(50)]
+        key = options_key({})
+        result = asyncio.run(worker_pool.map_chunks(clean_texts, texts, 7, key))
+        assert result == clean_texts(texts, key)
+    finally:
+        worker_pool.shutdown_process_pool()
@@ -0,0 +1,165 @@
+import argparse
+import asyncio
+import random
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from worker_pool import map_chunks, shutdown_process_pool
+
+AUG_P = 0.3
+MAX_VARIANTS = 10
+SYNONYM_CACHE_SIZE = 100000
+POS_CACHE_SIZE = 4096
+
+# Batches at least this large are augmented in the process pool
+PARALLEL_MIN_ROWS = 2000
+CHUNK_SIZE = 500
+
+
+@lru_cache(maxsize=None)
+def get_augmenter():
+    """The WordNet synonym augmenter of this process (the server and each pool worker), with memoized lookups
+
+    nlpaug asks WordNet for the synonyms of every chosen word on every call and
+    POS-tags the text again for every variant; both answers only depend on
+    their input, so they are cached on the augmenter's model.
+    """
+    import nlpaug.augmenter.word as naw
+
+    aug = naw.SynonymAug(aug_p=AUG_P)
+    model = aug.model
+    predict, pos_tag = model.predict, model.pos_tag
+
+    @lru_cache(maxsize=SYNONYM_CACHE_SIZE)
+    def synonyms(word: str, pos: Optional[str] = None) -> Tuple[str, ...]:
+        return tuple(predict(word, pos=pos))
+
+    @lru_cache(maxsize=POS_CACHE_SIZE)
+    def tags(tokens: Tuple[str, ...]) -> Tuple[Tuple[str, str], ...]:
+        return tuple(pos_tag(list(tokens)))
+
+    model.predict = synonyms
+    model.pos_tag = lambda tokens: list(tags(tuple(tokens)))
+    return aug
+
+
+def synonym_cache_info():
+    return get_augmenter().model.predict.cache_info()
+
+
+def augment_item(item) -> Optional[tuple]:
+    """(text, label) of one /augment-data record, or None if it has no usable text"""
+    # Handle different possible structures of item
+    if isinstance(item, dict):
+        # Case 1: item is a dict like {"text": "text1", "label": "label1"}
+        text = item.get("text")
+        label = item.get("label", "")
+    elif isinstance(item, list) and len(item) > 0:
+        # Case 2: item is a list like ["text1"]
+        text = item[0] if isinstance(item[0], str) else None
+        label = ""
+    elif isinstance(item, str):
+        # Case 3: item is a string like "text1"
+        text = item
+        label = ""
+    else:
+        # Skip invalid items
+        return None
+
+    # Ensure text is a string and not empty
+    if not isinstance(text, str) or not text.strip():
+        return None
+    return text, label
+
+
+def check_num_variants(num_variants: Any) -> int:
+    try:
+        num_variants = int(num_variants)
+    except (TypeError, ValueError):
+        raise ValueError("num_variants must be an integer")
+    if not 1 <= num_variants <= MAX_VARIANTS:
+        raise ValueError(f"num_variants must be between 1 and {MAX_VARIANTS}")
+    return num_variants
+
+
+def augment_chunk(items: list, num_variants: int = 1) -> List[Dict[str, Any]]:
+    """Up to num_variants distinct augmentations of each record, in input order (also the process pool task)"""
+    aug = get_augmenter()
+    augmented_data = []
+    for item in items:
+        parsed = augment_item(item)
+        if parsed is None:
+            continue
+        text, label = parsed
+        try:
+            # One call per text: the POS tags are computed once and shared by all variants
+            variants = aug.augment(text, n=num_variants)
+        except Exception as e:
+            print(f"Error augmenting text: {text}, Error: {str(e)}")
+            continue
+        augmented_data.extend({"text": variant, "label": label} for variant in dict.fromkeys(variants))
+    return augmented_data
+
+
+async def augment_chunk_async(items: list, num_variants: int = 1) -> List[Dict[str, Any]]:
+    """augment_chunk(), spreading large batches over the process pool"""
+    if len(items) < PARALLEL_MIN_ROWS:
+        return await asyncio.to_thread(augment_chunk, items, num_variants)
+    return await map_chunks(augment_chunk, items, CHUNK_SIZE, num_variants)
+
+
+def _sample_texts(n: int) -> List[str]:
+    sentences = [
+        "The quick brown fox jumps over the lazy dog.",
+        "This product is great and the delivery was fast.",
+        "The customer service team answered my question quickly.",
+        "I would not buy this cheap phone again.",
+        "The movie was long but the story was beautiful.",
+        "Students are learning how to build small language models.",
+    ]
+    rng = random.Random(0)
+    return [" ".join(rng.choices(sentences, k=rng.randint(1, 2))) for _ in range(n)]
+
+
+def _reference(texts: List[str]) -> List[str]:
+    """The original endpoint: a new SynonymAug per request, one uncached variant per text"""
+    import nlpaug.augmenter.word as naw
+
+    aug = naw.SynonymAug(aug_p=AUG_P)
+    return [aug.augment(text)[0] for text in texts]
+
+
+async def _benchmark(sizes: List[int], num_variants: int, reference_rows: int):
+    for n in sizes:
+        texts = _sample_texts(n)
+        sample = texts[:reference_rows]
+        start = time.perf_counter()
+        _reference(sample)
+        baseline = time.perf_counter() - start
+
+        start = time.perf_counter()
+        single = await augment_chunk_async(texts, 1)
+        cached = time.perf_counter() - start
+
+        start = time.perf_counter()
+        variants = await augment_chunk_async(texts, num_variants)
+        multi = time.perf_counter() - start
+
+        info = synonym_cache_info()
+        print(f"{n:>8,} texts: original {len(sample) / baseline:>8,.0f} texts/s (on {len(sample):,}) | "
+              f"shared + cached{' + process pool' if n >= PARALLEL_MIN_ROWS else ''} "
+              f"{len(single) / cached:>8,.0f} variants/s | "
+              f"{num_variants} variants per text {len(variants) / multi:>8,.0f} variants/s | "
+              f"synonym cache hits in this process {info.hits:,} / misses {info.misses:,}")
+    shutdown_process_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the /augment-data synonym augmentation engine")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--num-variants", type=int, default=3)
+    parser.add_argument("--reference-rows", type=int, default=2000,
+                        help="Texts augmented with the original loop (it is too slow for the full batch)")
+    args = parser.parse_args()
+    asyncio.run(_benchmark(args.sizes, args.num_variants, args.reference_rows))
@@ -0,0 +1,323 @@
+import argparse
+import asyncio
+import hashlib
+import os
+import random
+import re
+import time
+import unicodedata
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from worker_pool import map_chunks, shutdown_process_pool
+
+DEDUP_MODES = ("exact", "near")
+DEFAULT_THRESHOLD = 0.8
+NUM_PERM = 128
+# 32 bands of 4 rows: a pair shares a band with probability 1 - (1 - J^4)^32, i.e.
+# ~0.87 at 0.5 Jaccard, ~0.99 at 0.6 and > 0.999 from 0.7 up; candidates are then
+# verified against the threshold, so lower thresholds miss pairs, never add wrong ones
+NUM_BANDS = 32
+# Each row of a band bucket is verified against the next rows in signature order
+BUCKET_WINDOW = 32
+SHINGLE_SIZE = 3
+
+# Signatures of batches at least this large are computed in the process pool
+PARALLEL_MIN_ROWS = 50000
+CHUNK_SIZE = 20000
+# Rows hashed together in one NumPy pass (bounds the shingles x permutations matrix)
+SIGNATURE_BLOCK = 1000
+# Candidate pairs verified together in one NumPy pass
+PAIR_BLOCK = 20000
+
+# NDJSON streams remember every unique row; past this many they fail instead of growing
+STREAM_MAX_UNIQUE_ROWS = int(os.getenv("NDJSON_DEDUP_MAX_UNIQUE_ROWS", "5000000"))
+# Rows listed in the "merged" report of a stream (rows_removed still counts them all)
+STREAM_MAX_MERGED_REPORT = 10000
+
+_WORD_RE = re.compile(r"\w+")
+_PRIME = 4294967311  # smallest prime above 2**32, so a * x + b stays below 2**64
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+
+
+def dedup_options(options: Dict[str, Any]) -> Tuple[Optional[str], float]:
+    """(mode, threshold) from /clean-data options: "dedup" is false, "exact", "near" or true (= "near")"""
+    mode = options.get("dedup") or None
+    if mode is True:
+        mode = "near"
+    if mode is not None and mode not in DEDUP_MODES:
+        raise ValueError(f"Unknown dedup mode '{mode}', expected one of: {', '.join(DEDUP_MODES)}")
+    threshold = float(options.get("dedup_threshold", DEFAULT_THRESHOLD))
+    if not 0 < threshold <= 1:
+        raise ValueError("dedup_threshold must be in (0, 1]")
+    return mode, threshold
+
+
+def normalize(text: str) -> List[str]:
+    """Words of a text, case- and accent-form-insensitive, punctuation and spacing ignored"""
+    return _WORD_RE.findall(unicodedata.normalize("NFC", text).casefold())
+
+
+def text_hash(text: str) -> bytes:
+    return hashlib.blake2b(" ".join(normalize(text)).encode("utf-8"), digest_size=16).digest()
+
+
+def _shingle_hashes(text: str) -> List[int]:
+    words = normalize(text)
+    if len(words) <= SHINGLE_SIZE:
+        return [zlib.crc32(" ".join(words).encode("utf-8"))]
+    return list({zlib.crc32(" ".join(words[i:i + SHINGLE_SIZE]).encode("utf-8"))
+                 for i in range(len(words) - SHINGLE_SIZE + 1)})
+
+
+def _permutations(num_perm: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, 2 ** 32, size=num_perm, dtype=np.uint64)
+    b = rng.randint(0, 2 ** 32, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def minhash_signatures(texts: List[str], num_perm: int = NUM_PERM, seed: int = 1) -> np.ndarray:
+    """MinHash signatures of word shingles, one uint32 row per text (also the process pool task)"""
+    a, b = _permutations(num_perm, seed)
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint32)
+    for start in range(0, len(texts), SIGNATURE_BLOCK):
+        shingles = [_shingle_hashes(text) for text in texts[start:start + SIGNATURE_BLOCK]]
+        offsets = np.cumsum([0] + [len(s) for s in shingles[:-1]])
+        hashes = np.fromiter((h for s in shingles for h in s), dtype=np.uint64)
+        permuted = ((hashes[:, None] * a + b) % np.uint64(_PRIME)) & _MAX_HASH
+        signatures[start:start + len(shingles)] = np.minimum.reduceat(permuted, offsets, axis=0)
+    return signatures
+
+
+def _signature_chunk(texts: List[str], num_perm: int) -> List[np.ndarray]:
+    return list(minhash_signatures(texts, num_perm))
+
+
+class _UnionFind:
+    """Disjoint sets whose root is always the smallest (first-seen) row"""
+
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, i: int) -> int:
+        root = i
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[i] != root:
+            self.parent[i], i = root, self.parent[i]
+        return root
+
+    def union(self, i: int, j: int):
+        i, j = self.find(i), self.find(j)
+        if i != j:
+            self.parent[max(i, j)] = min(i, j)
+
+
+def _row_keys(values: np.ndarray) -> np.ndarray:
+    """One opaque, sortable key per row of a 2-D array"""
+    values = np.ascontiguousarray(values)
+    return values.view(np.dtype((np.void, values.dtype.itemsize * values.shape[1]))).ravel()
+
+
+def near_duplicate_pairs(signatures: np.ndarray, threshold: float = DEFAULT_THRESHOLD,
+                         num_bands: int = NUM_BANDS, window: int = BUCKET_WINDOW) -> Iterable[Tuple[int, int]]:
+    """(row, earlier row) pairs that share an LSH band and whose estimated Jaccard reaches the threshold
+
+    The rows of each band bucket are ordered by their full signature and each
+    row is checked against the next `window` rows of its bucket: all pairs of
+    a small bucket are verified, a large one costs O(size * window), and the
+    pairs checked never depend on the input order. A pair found in several
+    bands is verified once.
+    """
+    num_rows, num_perm = signatures.shape
+    if num_perm % num_bands:
+        raise ValueError("num_perm must be a multiple of num_bands")
+    rows_per_band = num_perm // num_bands
+    by_signature = np.argsort(_row_keys(signatures), kind="stable")
+    candidates = []
+    for band in range(num_bands):
+        _, bucket = np.unique(_row_keys(signatures[:, band * rows_per_band:(band + 1) * rows_per_band]),
+                              return_inverse=True)
+        order = by_signature[np.argsort(bucket.ravel()[by_signature], kind="stable")]
+        bucket = bucket.ravel()[order]
+        for offset in range(1, window + 1):
+            same = np.nonzero(bucket[:-offset] == bucket[offset:])[0]
+            if not len(same):
+                break  # no bucket has more than offset rows
+            first, second = order[same].astype(np.int64), order[same + offset].astype(np.int64)
+            candidates.append(np.maximum(first, second) * num_rows + np.minimum(first, second))
+    if not candidates:
+        return
+    pairs = np.unique(np.concatenate(candidates))
+    for start in range(0, len(pairs), PAIR_BLOCK):
+        later, earlier = np.divmod(pairs[start:start + PAIR_BLOCK], num_rows)
+        similarity = (signatures[later] == signatures[earlier]).mean(axis=1)
+        matched = similarity >= threshold
+        yield from zip(later[matched].tolist(), earlier[matched].tolist())
+
+
+def _merge_report(index: int, duplicate_of: int, match: str) -> Dict[str, Any]:
+    return {"index": index, "duplicate_of": duplicate_of, "match": match}
+
+
+def _exact(texts: List[str]) -> Tuple[List[int], List[Dict[str, Any]]]:
+    first_seen: Dict[bytes, int] = {}
+    kept, merged = [], []
+    for i, text in enumerate(texts):
+        duplicate_of = first_seen.setdefault(text_hash(text), i)
+        if duplicate_of == i:
+            kept.append(i)
+        else:
+            merged.append(_merge_report(i, duplicate_of, "exact"))
+    return kept, merged
+
+
+def _near(kept: List[int], merged: List[Dict[str, Any]], signatures: np.ndarray,
+          threshold: float) -> Tuple[List[int], List[Dict[str, Any]]]:
+    """Cluster the rows left by exact dedup (signatures[i] belongs to kept[i])"""
+    clusters = _UnionFind(len(kept))
+    for i, j in near_duplicate_pairs(signatures, threshold):
+        clusters.union(i, j)
+    survivors, survivor_of = [], {}
+    for position, index in enumerate(kept):
+        root = clusters.find(position)
+        if root == position:
+            survivors.append(index)
+        else:
+            survivor_of[index] = kept[root]
+    # Exact duplicates of a near-merged row follow it into its cluster
+    merged = [_merge_report(item["index"], survivor_of.get(item["duplicate_of"], item["duplicate_of"]), "exact")
+              for item in merged]
+    merged.extend(_merge_report(index, duplicate_of, "near") for index, duplicate_of in survivor_of.items())
+    merged.sort(key=lambda item: item["index"])
+    return survivors, merged
+
+
+class ExactDedupStream:
+    """Exact dedup of rows that arrive one at a time (NDJSON /clean-data)
+
+    Memory is O(unique rows): the 16-byte hash and first index of every row
+    kept so far, roughly 150 bytes per row with the dict overhead. Past
+    max_unique_rows add() raises ValueError rather than keep growing; the
+    merged report lists only the first max_merged removed rows.
+    """
+
+    def __init__(self, max_unique_rows: int = STREAM_MAX_UNIQUE_ROWS, max_merged: int = STREAM_MAX_MERGED_REPORT):
+        self.max_unique_rows = max_unique_rows
+        self.max_merged = max_merged
+        self.first_seen: Dict[bytes, int] = {}
+        self.merged: List[Dict[str, Any]] = []
+        self.rows_in = 0
+        self.rows_removed = 0
+
+    def add(self, text: str) -> bool:
+        """True if the row is kept, False if it duplicates an earlier row"""
+        index = self.rows_in
+        self.rows_in += 1
+        duplicate_of = self.first_seen.setdefault(text_hash(text), index)
+        if duplicate_of == index:
+            if len(self.first_seen) > self.max_unique_rows:
+                raise ValueError(f"More than {self.max_unique_rows} unique rows to deduplicate in one stream; "
+                                 "send a dataset_id instead")
+            return True
+        self.rows_removed += 1
+        if len(self.merged) < self.max_merged:
+            self.merged.append(_merge_report(index, duplicate_of, "exact"))
+        return False
+
+
+def deduplicate(texts: List[str], mode: str = "near",
+                threshold: float = DEFAULT_THRESHOLD) -> Tuple[List[int], List[Dict[str, Any]]]:
+    """Indices of the rows to keep, and which row each dropped row was merged into
+
+    Exact duplicates (same normalized text, by hash) are removed first; in
+    "near" mode the remaining rows are clustered with MinHash + LSH, and
+    each cluster keeps its first row. duplicate_of always names a kept row.
+    """
+    kept, merged = _exact(texts)
+    if mode == "near" and len(kept) > 1:
+        kept, merged = _near(kept, merged, minhash_signatures([texts[i] for i in kept]), threshold)
+    return kept, merged
+
+
+async def deduplicate_async(texts: List[str], mode: str = "near",
+                            threshold: float = DEFAULT_THRESHOLD) -> Tuple[List[int], List[Dict[str, Any]]]:
+    """deduplicate(), computing the signatures of large batches in the process pool"""
+    if mode != "near" or len(texts) < PARALLEL_MIN_ROWS:
+        return await asyncio.to_thread(deduplicate, texts, mode, threshold)
+
+    kept, merged = await asyncio.to_thread(_exact, texts)
+    if len(kept) > 1:
+        rows = await map_chunks(_signature_chunk, [texts[i] for i in kept], CHUNK_SIZE, NUM_PERM)
+        kept, merged = await asyncio.to_thread(_near, kept, merged, np.vstack(rows), threshold)
+    return kept, merged
+
+
+def _sample_texts(n: int, duplicate_rate: float = 0.3) -> List[str]:
+    words = ("data model text label train test clean token vector class review price product "
+             "customer service quality delivery fast slow good bad great poor").split()
+    rng = random.Random(0)
+    texts = []
+    for _ in range(n):
+        if texts and rng.random() < duplicate_rate:
+            source = rng.choice(texts).split()
+            if rng.random() < 0.5:
+                # Near duplicate: one word changed
+                source[rng.randrange(len(source))] = rng.choice(words)
+            texts.append(" ".join(source).upper() if rng.random() < 0.2 else " ".join(source))
+        else:
+            texts.append(" ".join(rng.choices(words, k=rng.randint(12, 30))))
+    return texts
+
+
+def _brute_force_pairs(signatures: np.ndarray, threshold: float) -> List[Tuple[int, int]]:
+    """Pairs above the threshold by comparing every pair of signatures (the quadratic baseline)"""
+    pairs = []
+    for i in range(1, len(signatures)):
+        matches = np.nonzero((signatures[:i] == signatures[i]).mean(axis=1) >= threshold)[0]
+        pairs.extend((i, int(j)) for j in matches)
+    return pairs
+
+
+def _num_clusters(num_rows: int, pairs: Iterable[Tuple[int, int]]) -> int:
+    clusters = _UnionFind(num_rows)
+    for i, j in pairs:
+        clusters.union(i, j)
+    return sum(clusters.find(i) == i for i in range(num_rows))
+
+
+async def _benchmark(sizes: List[int], threshold: float):
+    texts = _sample_texts(2000)
+    kept, _ = deduplicate(texts, "exact")
+    signatures = minhash_signatures([texts[i] for i in kept])
+    start = time.perf_counter()
+    expected = _num_clusters(len(kept), _brute_force_pairs(signatures, threshold))
+    brute_force = time.perf_counter() - start
+    start = time.perf_counter()
+    found = _num_clusters(len(kept), near_duplicate_pairs(signatures, threshold))
+    banded = time.perf_counter() - start
+    print(f"{len(kept):,} rows: all pairs {brute_force:.2f}s -> {expected:,} clusters | "
+          f"LSH bands {banded:.3f}s -> {found:,} clusters")
+
+    for n in sizes:
+        texts = _sample_texts(n)
+        start = time.perf_counter()
+        exact_kept, _ = await deduplicate_async(texts, "exact", threshold)
+        exact = time.perf_counter() - start
+        start = time.perf_counter()
+        near_kept, _ = await deduplicate_async(texts, "near", threshold)
+        near = time.perf_counter() - start
+        print(f"{n:>9,} rows: exact {n / exact:>10,.0f} rows/s keeps {len(exact_kept):,} | "
+              f"exact + near {n / near:>9,.0f} rows/s keeps {len(near_kept):,}")
+    shutdown_process_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark exact and MinHash/LSH near-duplicate removal")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+    asyncio.run(_benchmark(args.sizes, args.threshold))
@@ -0,0 +1,133 @@
+import argparse
+import asyncio
+import random
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+from text_tokenizers import DEFAULT_TOKENIZER, get_tokenizer
+from worker_pool import map_chunks, shutdown_process_pool
+
+PREPROCESSING_OPTIONS = ("lowercase", "remove_stopwords", "lemmatize")
+
+# Batches at least this large are preprocessed in the process pool
+PARALLEL_MIN_ROWS = 5000
+CHUNK_SIZE = 2000
+LEMMA_CACHE_SIZE = 100000
+
+
+def options_key(options: Dict[str, Any]) -> Tuple[Any, ...]:
+    """Preprocessing flags in a fixed order (each defaults to True, as in /preprocess-data), then the tokenizer"""
+    tokenizer = options.get("tokenizer") or DEFAULT_TOKENIZER
+    get_tokenizer(tokenizer)  # ValueError on unknown names, before any work is done
+    return tuple(bool(options.get(name, True)) for name in PREPROCESSING_OPTIONS) + (tokenizer,)
+
+
+def steps_applied(key: Tuple[Any, ...]) -> List[str]:
+    """The steps a request runs, in order"""
+    lowercase, remove_stopwords, lemmatize, _ = key
+    steps = ["lowercase"] if lowercase else []
+    steps.append("tokenize")
+    if remove_stopwords:
+        steps.append("remove_stopwords")
+    if lemmatize:
+        steps.append("lemmatize")
+    return steps
+
+
+# NLTK resources are loaded once per process (the server and each pool worker)
+@lru_cache(maxsize=None)
+def get_stop_words() -> frozenset:
+    from nltk.corpus import stopwords
+    return frozenset(stopwords.words("english"))
+
+
+@lru_cache(maxsize=None)
+def get_lemmatizer():
+    from nltk.stem import WordNetLemmatizer
+    return WordNetLemmatizer()
+
+
+@lru_cache(maxsize=LEMMA_CACHE_SIZE)
+def lemmatize(token: str) -> str:
+    """WordNet lemma of a token; the vocabulary is small, so most calls are cache hits"""
+    return get_lemmatizer().lemmatize(token)
+
+
+def preprocess_texts(texts: List[str], key: Tuple[Any, ...]) -> List[Dict[str, str]]:
+    """Preprocess a list of texts in this process (also the process pool task)"""
+    lowercase, remove_stopwords, lemmatize_tokens, tokenizer = key
+    tokenize = get_tokenizer(tokenizer)
+    stop_words = get_stop_words() if remove_stopwords else None
+
+    results = []
+    for original_text in texts:
+        text = original_text.lower() if lowercase else original_text
+        tokens = tokenize(text)
+        if remove_stopwords:
+            tokens = [t for t in tokens if t not in stop_words]
+        if lemmatize_tokens:
+            tokens = [lemmatize(t) for t in tokens]
+        results.append({
+            "text": " ".join(tokens),
+            "original_text": original_text
+        })
+    return results
+
+
+async def preprocess_texts_async(texts: List[str], options: Dict[str, Any]) -> List[Dict[str, str]]:
+    """Preprocess texts, spreading large batches over the process pool"""
+    key = options_key(options)
+    if len(texts) < PARALLEL_MIN_ROWS:
+        return await asyncio.to_thread(preprocess_texts, texts, key)
+    return await map_chunks(preprocess_texts, texts, CHUNK_SIZE, key)
+
+
+def _sample_texts(n: int) -> List[str]:
+    sentences = [
+        "The cats are running across the gardens and jumping over fences.",
+        "Natural language processing helps computers understand human languages.",
+        "She was reading the books that her friends had recommended last week.",
+        "Data scientists are building models to classify customer reviews.",
+        "It's raining, so the children aren't playing outside today!",
+    ]
+    rng = random.Random(0)
+    return [" ".join(rng.choices(sentences, k=rng.randint(1, 3))) for _ in range(n)]
+
+
+def _reference(texts: List[str]) -> List[str]:
+    """The original per-request loop: fresh resources and uncached lemmas"""
+    from nltk.corpus import stopwords
+    from nltk.stem import WordNetLemmatizer
+    from nltk.tokenize import word_tokenize
+
+    stop_words = set(stopwords.words("english"))
+    lemmatizer = WordNetLemmatizer()
+    return [" ".join(lemmatizer.lemmatize(t) for t in word_tokenize(text.lower()) if t not in stop_words)
+            for text in texts]
+
+
+async def _benchmark(sizes: List[int]):
+    for n in sizes:
+        texts = _sample_texts(n)
+        start = time.perf_counter()
+        expected = _reference(texts)
+        baseline = time.perf_counter() - start
+
+        lemmatize.cache_clear()
+        start = time.perf_counter()
+        actual = await preprocess_texts_async(texts, {})
+        optimized = time.perf_counter() - start
+
+        assert [item["text"] for item in actual] == expected
+        print(f"{n:>8,} texts: original {n / baseline:>9,.0f} texts/s | "
+              f"cached resources + lemma memo{' + process pool' if n >= PARALLEL_MIN_ROWS else ''} "
+              f"{n / optimized:>9,.0f} texts/s")
+    shutdown_process_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the /preprocess-data pipeline")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    args = parser.parse_args()
+    asyncio.run(_benchmark(args.sizes))
@@ -0,0 +1,93 @@
+import argparse
+import base64
+import io
+import json
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pyarrow as pa
+
+NPY_MEDIA_TYPE = "application/x-npy"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+VECTOR_FORMATS = ("json", "npy", "arrow", "base64")
+VECTOR_DTYPES = {"float32": "<f4", "float16": "<f2"}
+_MEDIA_TYPE_FORMATS = {NPY_MEDIA_TYPE: "npy", ARROW_MEDIA_TYPE: "arrow"}
+
+
+def negotiate_format(accept: Optional[str], requested: Optional[str] = None) -> str:
+    """Vector format of a request: an explicit "format" wins, then the Accept header, else JSON"""
+    if requested:
+        if requested not in VECTOR_FORMATS:
+            raise ValueError(f"Unknown vector format '{requested}', expected one of: {', '.join(VECTOR_FORMATS)}")
+        return requested
+    for media_type in (accept or "").split(","):
+        vector_format = _MEDIA_TYPE_FORMATS.get(media_type.split(";")[0].strip())
+        if vector_format:
+            return vector_format
+    return "json"
+
+
+def check_dtype(dtype: str) -> str:
+    if dtype not in VECTOR_DTYPES:
+        raise ValueError(f"Unknown vector dtype '{dtype}', expected one of: {', '.join(VECTOR_DTYPES)}")
+    return dtype
+
+
+def as_little_endian(vectors: np.ndarray, dtype: str = "float32") -> np.ndarray:
+    """The embedding matrix as a C-contiguous little-endian array (no copy when it already is one)"""
+    return np.ascontiguousarray(vectors, dtype=VECTOR_DTYPES[check_dtype(dtype)])
+
+
+def to_npy(vectors: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    np.save(buffer, vectors, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def to_arrow(vectors: np.ndarray, metadata: Optional[Dict[str, str]] = None) -> bytes:
+    """An Arrow IPC stream with one fixed-size-list "vector" column, built on the NumPy buffer"""
+    num_rows, dim = vectors.shape
+    values = pa.array(vectors.reshape(-1))  # zero-copy for numeric arrays
+    column = pa.FixedSizeListArray.from_arrays(values, dim)
+    table = pa.Table.from_arrays([column], names=["vector"]).replace_schema_metadata(metadata)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def to_base64(vectors: np.ndarray) -> Dict[str, Any]:
+    """The raw little-endian buffer as base64, with what a client needs to rebuild the matrix"""
+    return {
+        "dtype": vectors.dtype.name,
+        "byteorder": "little",
+        "shape": list(vectors.shape),
+        "data": base64.b64encode(vectors.data).decode("ascii"),
+    }
+
+
+def _benchmark(rows: int, dim: int):
+    vectors = np.random.default_rng(0).standard_normal((rows, dim), dtype=np.float32)
+    encoders = {
+        "json (tolist)": lambda: json.dumps({"vectors": vectors.tolist()}).encode("utf-8"),
+        "npy float32": lambda: to_npy(as_little_endian(vectors)),
+        "arrow float32": lambda: to_arrow(as_little_endian(vectors)),
+        "base64 float32": lambda: json.dumps({"vectors": to_base64(as_little_endian(vectors))}).encode("utf-8"),
+        "base64 float16": lambda: json.dumps({"vectors": to_base64(as_little_endian(vectors, "float16"))}).encode("utf-8"),
+    }
+    print(f"{rows:,} x {dim} float32 embeddings")
+    for name, encode in encoders.items():
+        start = time.perf_counter()
+        size = len(encode())
+        elapsed = time.perf_counter() - start
+        print(f"  {name:<15} {size / 1e6:>9.1f} MB  {elapsed * 1000:>9.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the /represent vector output formats")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    args = parser.parse_args()
+    _benchmark(args.rows, args.dim)
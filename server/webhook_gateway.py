@@ -0,0 +1,246 @@
+import argparse
+import asyncio
+import random
+import time
+from typing import Dict, Optional
+
+import httpx
+
+# Upstream answers worth retrying: the request is a GET, so it is safe to repeat
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+# Failures where the request never reached the webhook; a read timeout is not
+# retried, since the webhook already spent the whole timeout on it
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling upstream while the circuit breaker is open"""
+
+
+class UpstreamStatusError(Exception):
+    def __init__(self, status_code: int, text: str):
+        super().__init__(f"Upstream returned HTTP {status_code}")
+        self.status_code = status_code
+        self.text = text
+
+
+class CircuitBreaker:
+    """Open after failure_threshold consecutive failures, retry one call after reset_timeout"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> bool:
+        """Raise CircuitOpenError if no call may go through; True when this call is the half-open trial"""
+        state = self.state
+        if state == "open" or (state == "half_open" and self._trial_in_flight):
+            raise CircuitOpenError("Chat webhook is unavailable, circuit breaker is open")
+        if state == "half_open":
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def release_trial(self):
+        """End a trial call that neither succeeded nor failed (e.g. it was cancelled)"""
+        self._trial_in_flight = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class WebhookGateway:
+    """Shared keep-alive client for a GET webhook with bounded concurrency, retries and a breaker
+
+    deadline (default: timeout) bounds the whole call, waiting for a slot and
+    every attempt and backoff included. A concurrency slot is only held while
+    a request is in flight, not during backoff.
+    """
+
+    def __init__(self, url: str, timeout: float = 30.0, max_concurrency: int = 20,
+                 retries: int = 2, backoff_base: float = 0.25, backoff_max: float = 2.0,
+                 breaker: Optional[CircuitBreaker] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None,
+                 deadline: Optional[float] = None):
+        self.url = url
+        self.timeout = timeout
+        self.deadline = timeout if deadline is None else deadline
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _ensure_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                transport=self.transport,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency
+                )
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def get_text(self, params: Dict[str, str]) -> str:
+        """GET the webhook and return the response body of a 200 answer"""
+        is_trial = self.breaker.before_call()
+        try:
+            return await self._get_text(params)
+        finally:
+            if is_trial:
+                # Any other exit (cancellation, unexpected errors) must not leave the breaker stuck open
+                self.breaker.release_trial()
+
+    async def _get_text(self, params: Dict[str, str]) -> str:
+        client = self._ensure_client()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline
+
+        last_error: Exception = None
+        for attempt in range(self.retries + 1):
+            remaining = deadline - loop.time()
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), max(remaining, 0.0))
+            except asyncio.TimeoutError:
+                # Local saturation, not a webhook failure: the breaker is left alone
+                raise httpx.PoolTimeout("No free webhook slot before the deadline")
+            try:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise httpx.PoolTimeout("No free webhook slot before the deadline")
+                response = await client.get(self.url, params=params, timeout=min(self.timeout, remaining))
+            except RETRYABLE_ERRORS as e:
+                last_error = e
+            except httpx.TransportError:
+                # Read/write timeouts, dropped connections: the webhook is struggling
+                self.breaker.record_failure()
+                raise
+            else:
+                if response.status_code == 200:
+                    self.breaker.record_success()
+                    return response.text
+                last_error = UpstreamStatusError(response.status_code, response.text)
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    if response.status_code >= 500:
+                        # A webhook that keeps failing must open the breaker
+                        self.breaker.record_failure()
+                    else:
+                        # The webhook is up; the request itself was rejected
+                        self.breaker.record_success()
+                    raise last_error
+            finally:
+                self._semaphore.release()
+
+            if attempt < self.retries:
+                # Full jitter keeps retrying clients from synchronizing
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                if loop.time() + delay >= deadline:
+                    break
+                await asyncio.sleep(delay)
+
+        self.breaker.record_failure()
+        raise last_error
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "url": self.url,
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "max_concurrency": self.max_concurrency,
+        }
+
+
+async def _stub_webhook(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, delay: float, failure_rate: float):
+    """Minimal keep-alive HTTP/1.1 server answering every GET with a plain-text reply"""
+    try:
+        while True:
+            request = await reader.readuntil(b"\r\n\r\n")
+            if not request:
+                break
+            await asyncio.sleep(delay)
+            if random.random() < failure_rate:
+                status, body = "503 Service Unavailable", b"unavailable"
+            else:
+                status, body = "200 OK", "Xin chào từ webhook giả lập".encode("utf-8")
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: text/plain; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n".encode("ascii") + body
+            )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        pass
+    finally:
+        writer.close()
+
+
+async def _load_test(requests: int, concurrency: int, delay: float, failure_rate: float):
+    server = await asyncio.start_server(
+        lambda r, w: _stub_webhook(r, w, delay, failure_rate), "127.0.0.1", 0
+    )
+    port = server.sockets[0].getsockname()[1]
+    gateway = WebhookGateway(f"http://127.0.0.1:{port}/webhook/chatbot-response",
+                             max_concurrency=concurrency, backoff_base=0.01)
+
+    latencies, errors = [], 0
+
+    async def one(i: int):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            await gateway.get_text({"message": f"câu hỏi {i}", "sessionId": "load-test"})
+            latencies.append(time.perf_counter() - start)
+        except Exception:
+            errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    await gateway.aclose()
+    server.close()
+    await server.wait_closed()
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0.0
+    p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0.0
+    print(f"{requests} requests, concurrency {concurrency}: {requests / elapsed:.1f} req/s, "
+          f"p50 {p50:.1f} ms, p95 {p95:.1f} ms, errors {errors}, circuit {gateway.breaker.state}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test WebhookGateway against a local stub webhook")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--delay-ms", type=float, default=20.0, help="Stub webhook latency")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of stub replies that are 503")
+    args = parser.parse_args()
+    asyncio.run(_load_test(args.requests, args.concurrency, args.delay_ms / 1000, args.failure_rate))
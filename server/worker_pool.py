@@ -0,0 +1,65 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, List, Optional, Sequence
+
+# Số process cho các tác vụ xử lý văn bản lớn (mặc định: số CPU)
+PROCESS_POOL_WORKERS = int(os.getenv("PROCESS_POOL_WORKERS", "0")) or os.cpu_count() or 1
+
+# Modules whose functions run in the pool; the fork server imports them once, so workers start warm
+POOL_MODULES = ["text_cleaning", "text_preprocessing", "text_augmentation", "text_dedup"]
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _mp_context() -> multiprocessing.context.BaseContext:
+    """Start workers without fork(): the server process holds threads (event loop, torch, tokenizers)
+
+    A forked child inherits their locks in whatever state they were, which can
+    deadlock it. The fork server starts from a clean interpreter that only
+    imports POOL_MODULES, not __main__ (app.py and its models); platforms
+    without it fall back to spawn.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(POOL_MODULES)
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Process pool shared by the batch text endpoints, created on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PROCESS_POOL_WORKERS, mp_context=_mp_context())
+        return _pool
+
+
+def shutdown_process_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def chunked(items: Sequence[Any], chunk_size: int) -> List[Sequence[Any]]:
+    return [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+
+async def map_chunks(fn: Callable[..., List[Any]], items: Sequence[Any], chunk_size: int, *args) -> List[Any]:
+    """Run fn(chunk, *args) on chunks of items in the process pool and concatenate the results in order
+
+    fn must be a module-level function so it can be pickled.
+    """
+    loop = asyncio.get_running_loop()
+    pool = get_process_pool()
+    results = await asyncio.gather(*(
+        loop.run_in_executor(pool, partial(fn, chunk, *args)) for chunk in chunked(items, chunk_size)
+    ))
+    return [item for chunk_result in results for item in chunk_result]